@@ -1,6 +1,7 @@
 import json
 import os
 import re
+import shutil
 from configparser import ConfigParser
 from pathlib import Path
 from typing import Type
@@ -17,11 +18,20 @@ from my_config import (
 )
 from model.helpers import (
     AlternateJsonEncoder,
+    AttachmentStore,
+    AttachmentWriter,
+    HtmlRenderer,
     JsonHelper,
+    Logger,
+    ParseCache,
+    ShardedReport,
+    Snapshot,
+    TrafficLog,
     YamlHelper
 )
 from utils.altcollections import (
     ExtDict,
+    PersistentExtDict,
     TupleDict
 )
 from utils.faker import Fake
@@ -99,6 +109,16 @@ def tupledict() -> Type[TupleDict]:
     return TupleDict
 
 
+@pytest.fixture(scope='session')
+def persistent_extdict() -> Type[PersistentExtDict]:
+    return PersistentExtDict
+
+
+@pytest.fixture
+def snapshot() -> Snapshot:
+    return Snapshot.get_current()
+
+
 @pytest.fixture(scope='session', autouse=True)
 def metadata_for_tests(metadata, env, global_config, project_root):
     metadata['Test environment'] = env
@@ -126,7 +146,10 @@ def metadata_for_tests(metadata, env, global_config, project_root):
 def _rotate_report(path: Path, limit: int, counter=1):
     if path.exists():
         if counter == limit:
-            os.remove(path)
+            if path.is_dir():
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
         else:
             new_path = Path.joinpath(
                 path.parent,
@@ -137,11 +160,62 @@ def _rotate_report(path: Path, limit: int, counter=1):
             path.rename(new_path)
 
 
+def _clean_attachments(report_dir: Path, directory: Path):
+    """Removes stored attachments which are not referenced by the reports
+    left after rotation."""
+    if not directory.exists():
+        return
+    referenced = set()
+    for report in report_dir.glob('*.html'):
+        referenced.update(re.findall(
+            r'/[0-9a-f]{2}/([0-9a-f]{64}[\w.]*)',
+            report.read_text(encoding='utf-8', errors='ignore')))
+    for path in directory.glob('*/*'):
+        if path.is_file() and path.name not in referenced:
+            path.unlink()
+
+
 def pytest_configure(config):
     config.addinivalue_line("markers", "slow: mark test as slow to run")
+    config.addinivalue_line("markers", "db_commit: changes of the test are "
+                                       "committed by db isolation fixtures")
     project_root = Path(config.rootdir)
     services = project_root / 'tests'
     global_schema = project_root / 'global_jsonschema'
+    if getattr(config, 'cache', None) is not None:
+        ParseCache.cache_dir = config.cache.mkdir('parsed_files')
+    Snapshot.update = config.getoption('--snapshot-update')
+    Logger.log_passed = config.getoption('--log-passed')
+    AttachmentWriter.configure(config,
+                               config.getoption('--async-attachments'))
+    sharded_path = config.getoption('--sharded-report')
+    if sharded_path and not hasattr(config, 'workerinput'):
+        _rotate_report(Path(sharded_path), config.getoption('--max-reports'))
+        config.pluginmanager.register(
+            ShardedReport(sharded_path,
+                          project_root / 'model/helpers/style.css'),
+            'sharded_report')
+    if html_path := config.getoption('--html', None):
+        HtmlRenderer.report_dir = Path(html_path).absolute().parent
+        AttachmentStore.directory = HtmlRenderer.report_dir / 'attachments'
+    elif sharded_path:
+        HtmlRenderer.report_dir = Path(sharded_path).absolute()
+        AttachmentStore.directory = HtmlRenderer.report_dir / 'attachments'
+    elif config.getoption('--alluredir', None):
+        AttachmentStore.directory = project_root / 'reports' / 'attachments'
+        if config.getoption('--clean-alluredir', False) \
+                and not hasattr(config, 'workerinput'):
+            # Attachment files of Allure results are hard links, the stored
+            # objects are not needed by the cleaned results
+            shutil.rmtree(AttachmentStore.directory, ignore_errors=True)
+    AttachmentStore.compress = config.getoption('--compress-attachments')
+    if traffic_dir := config.getoption('--traffic-log'):
+        if not hasattr(config, 'workerinput'):
+            TrafficLog.clean(project_root / traffic_dir)
+        # The xdist controller makes no calls, only workers write the log
+        if hasattr(config, 'workerinput') \
+                or config.getoption('dist', 'no') == 'no':
+            TrafficLog.open(project_root / traffic_dir)
 
     for service in [x for x in services.iterdir() if
                     x.is_dir() and x.parts[-1] != '__pycache__']:
@@ -173,6 +247,10 @@ def pytest_sessionstart(session):
     if html_path := session.config.getoption('--html'):
         _rotate_report(Path(html_path),
                        session.config.getoption('--max-reports'))
+        if AttachmentStore.enabled() \
+                and not hasattr(session.config, 'workerinput'):
+            _clean_attachments(Path(html_path).parent,
+                               Path(AttachmentStore.directory))
 
 
 def pytest_addoption(parser):
@@ -187,3 +265,29 @@ def pytest_addoption(parser):
         choices=range(1, 1001),
         help="Maximum count of stored reports before rotation."
     )
+    parser.addoption(
+        "--snapshot-update", action="store_true", default=False,
+        help="Re-record snapshots which do not match."
+    )
+    parser.addoption(
+        "--log-passed", action="store_true", default=False,
+        help="Attach request and SQL logs to passed tests as well."
+    )
+    parser.addoption(
+        "--async-attachments", action="store_true", default=False,
+        help="Write Allure attachments in a background thread."
+    )
+    parser.addoption(
+        "--traffic-log", action="store", default=None,
+        help="Directory for JSONL traffic logs of workers "
+             "(see utils/traffic_index.py)."
+    )
+    parser.addoption(
+        "--compress-attachments", action="store_true", default=False,
+        help="Gzip attachments stored next to the reports."
+    )
+    parser.addoption(
+        "--sharded-report", action="store", default=None,
+        help="Directory for the sharded HTML report: index.html, "
+             "summary.json and per-test shards loaded on demand."
+    )
@@ -1,8 +1,18 @@
+from .attachment_store import AttachmentStore
+from .attachment_writer import AttachmentWriter
+from .html_renderer import HtmlRenderer
 from .json_helper import (
     AlternateJsonEncoder,
     JsonHelper
 )
 from .log_helper import LogHelper
 from .logger import Logger
+from .parse_cache import ParseCache
+from .sharded_report import ShardedReport
+from .snapshot import (
+    Snapshot,
+    SnapshotStore
+)
+from .traffic_log import TrafficLog
 from .xml_helper import XMLHelper
 from .yaml_helper import YamlHelper
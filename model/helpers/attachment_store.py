@@ -0,0 +1,76 @@
+import gzip
+import hashlib
+import os
+import shutil
+import threading
+from pathlib import Path
+
+
+class AttachmentStore:
+    """
+    Content-addressed storage of report attachments:
+        <directory>/<aa>/<sha256><suffix>[.gz]
+    Identical payloads are written once. HtmlRenderer saves its artifacts
+    here and refers to payloads which were already shown, Allure
+    attachments written with --async-attachments are hard links to the
+    stored objects.
+    With 'compress' objects are gzipped at rest (Allure attachments are
+    then written as plain files, Allure can not read compressed ones).
+    """
+    directory: Path = None
+    compress: bool = False
+
+    @classmethod
+    def enabled(cls) -> bool:
+        return cls.directory is not None
+
+    @staticmethod
+    def encode(data) -> bytes:
+        return data.encode('utf-8') if isinstance(data, str) else data
+
+    @classmethod
+    def digest(cls, data) -> str:
+        return hashlib.sha256(cls.encode(data)).hexdigest()
+
+    @classmethod
+    def path(cls, digest: str, suffix: str, compress=None) -> Path:
+        compress = cls.compress if compress is None else compress
+        file_name = f'{digest}{suffix}.gz' if compress else f'{digest}{suffix}'
+        return Path(cls.directory) / digest[:2] / file_name
+
+    @classmethod
+    def put(cls, data, suffix: str, digest: str = None,
+            compress=None) -> Path:
+        """Stores data if it is not stored yet, returns path of the object."""
+        data = cls.encode(data)
+        digest = digest or cls.digest(data)
+        compress = cls.compress if compress is None else compress
+        path = cls.path(digest, suffix, compress)
+        if not path.exists():
+            cls._write(path, gzip.compress(data) if compress else data)
+        return path
+
+    @classmethod
+    def link(cls, data, destination: Path):
+        """Writes data to 'destination' as a hard link to the stored object."""
+        data = cls.encode(data)
+        destination = Path(destination)
+        if cls.compress:
+            cls._write(destination, data)
+            return
+        source = cls.put(data, destination.suffix, compress=False)
+        try:
+            os.link(source, destination)
+        except FileExistsError:
+            pass
+        except OSError:
+            # E.g. different file systems
+            shutil.copyfile(source, destination)
+
+    @classmethod
+    def _write(cls, path: Path, data: bytes):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(
+            f'{path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
@@ -0,0 +1,135 @@
+import threading
+import warnings
+from pathlib import Path
+from queue import Queue
+from uuid import uuid4
+
+import allure
+from allure_commons import plugin_manager
+from allure_commons.logger import AllureFileLogger
+
+from .attachment_store import AttachmentStore
+
+
+class AttachmentWriter:
+    """
+    Asynchronous Allure attachments (--async-attachments).
+    An attachment is registered in the current test or step synchronously,
+    so the report structure does not change, while rendering of its body
+    and writing of the file are done by a background thread of the worker.
+    The queue is bounded: attach() blocks when the writer falls behind.
+    With AttachmentStore enabled identical attachments are stored once.
+    The asynchronous mode relies on internals of allure-pytest (the file
+    name registration of the listener and the results directory of its
+    file logger), without them, and in the synchronous mode, attachments
+    are written by allure.attach().
+    flush() waits until all queued attachments are written, the plugin
+    calls stop() at the end of the session.
+    """
+    enabled: bool = False
+    max_queue: int = 64
+
+    _pluginmanager = None
+    _queue: Queue = None
+    _thread: threading.Thread = None
+    _lock = threading.Lock()
+    _errors: list = []
+
+    @classmethod
+    def configure(cls, config, enabled: bool):
+        cls._pluginmanager = config.pluginmanager
+        cls.enabled = enabled
+        cls._errors = []
+
+    @classmethod
+    def attach(cls, body, name, attachment_type):
+        """
+        'body' - str, bytes or a callable which returns them, the callable
+        is called by the writer thread.
+        """
+        reporter = cls._reporter() if cls.enabled else None
+        if reporter is None:
+            allure.attach(body() if callable(body) else body,
+                          name=name,
+                          attachment_type=attachment_type)
+            return
+        file_name = reporter._attach(uuid4(),
+                                     name=name,
+                                     attachment_type=attachment_type)
+        cls._start().put((body, file_name))
+
+    @classmethod
+    def flush(cls):
+        queue = cls._queue
+        if queue is not None:
+            queue.join()
+
+    @classmethod
+    def stop(cls):
+        with cls._lock:
+            thread, queue = cls._thread, cls._queue
+            cls._thread = None
+            cls._queue = None
+        if thread is None:
+            return
+        queue.put(None)
+        thread.join()
+        for error in cls._errors:
+            warnings.warn(f'Attachment was not written: {error!r}')
+        cls._errors = []
+
+    @classmethod
+    def _write(cls, body, file_name):
+        if callable(body):
+            body = body()
+        results_dir = cls._results_dir()
+        if AttachmentStore.enabled() and results_dir is not None:
+            # Identical attachments are stored once
+            AttachmentStore.link(body, results_dir / file_name)
+        else:
+            plugin_manager.hook.report_attached_data(body=body,
+                                                     file_name=file_name)
+
+    @staticmethod
+    def _results_dir():
+        for plugin in plugin_manager.get_plugins():
+            if isinstance(plugin, AllureFileLogger):
+                report_dir = getattr(plugin, '_report_dir', None)
+                return None if report_dir is None else Path(report_dir)
+        return None
+
+    @classmethod
+    def _reporter(cls):
+        if cls._pluginmanager is None:
+            return None
+        listener = cls._pluginmanager.get_plugin('allure_listener')
+        reporter = getattr(listener, 'allure_logger', None)
+        if not callable(getattr(reporter, '_attach', None)):
+            return None
+        return reporter
+
+    @classmethod
+    def _start(cls) -> Queue:
+        with cls._lock:
+            if cls._thread is not None:
+                return cls._queue
+            cls._queue = Queue(maxsize=cls.max_queue)
+            cls._thread = threading.Thread(target=cls._run,
+                                           args=(cls._queue,),
+                                           name='allure-attachments',
+                                           daemon=True)
+            cls._thread.start()
+            return cls._queue
+
+    @classmethod
+    def _run(cls, queue: Queue):
+        while True:
+            task = queue.get()
+            try:
+                if task is None:
+                    return
+                cls._write(*task)
+            except Exception as e:
+                cls._errors.append(e)
+            finally:
+                queue.task_done()
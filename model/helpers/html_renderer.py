@@ -0,0 +1,138 @@
+import json
+import os
+from html import escape
+from pathlib import Path
+
+from my_config import (
+    html_max_rows,
+    html_max_text_size
+)
+from .attachment_store import AttachmentStore
+
+
+class HtmlRenderer:
+    """
+    Escaped HTML blocks of the report with size limits.
+    Texts are consumed chunk by chunk and rendering stops at
+    'max_text_size' characters, SQL results are cut to 'max_rows' rows.
+    The full data of a truncated block is saved to AttachmentStore (next to
+    the HTML report, report_dir is set by conftest) and linked from the
+    block. A payload with the same key as one already rendered for the
+    current test is shown as a link to the stored payload.
+    """
+    max_text_size: int = html_max_text_size
+    max_rows: int = html_max_rows
+    max_cell_size: int = 1000
+    report_dir: Path = None
+    # Keys of payloads rendered for the current test: url of the stored
+    # payload or None, see start_test()
+    _shown: dict = {}
+
+    @classmethod
+    def start_test(cls):
+        """Payloads of other tests may be not rendered (passed tests, log
+        limits), so repeated payloads are linked only within a test."""
+        cls._shown = {}
+
+    @classmethod
+    def text(cls, chunks, artifact=None, key=None, summary='') -> str:
+        """
+        'chunks' - str or iterable of str;
+        'artifact' - callable which returns (bytes, file suffix) of the full
+        content, it is called only if the text is truncated or repeated;
+        'key' - digest of the content to render repeated payloads as links,
+        with the 'summary' line instead of the content.
+        """
+        if key is not None and artifact is not None and cls._can_link():
+            if key in cls._shown:
+                if cls._shown[key] is None:
+                    cls._shown[key] = cls.save_artifact(*artifact())
+                return (f'{escape(summary)}\n... the same content as logged '
+                        f'earlier, {cls._anchor(cls._shown[key])}')
+            cls._shown[key] = None
+        if isinstance(chunks, str):
+            chunks = (chunks,)
+        parts = []
+        size = 0
+        truncated = False
+        for chunk in chunks:
+            if size + len(chunk) > cls.max_text_size:
+                parts.append(chunk[:cls.max_text_size - size])
+                truncated = True
+                break
+            parts.append(chunk)
+            size += len(chunk)
+        result = escape(''.join(parts))
+        if truncated:
+            result += (f'\n\n... truncated at {cls.max_text_size} '
+                       f'characters{cls._link(artifact)}')
+        return result
+
+    @classmethod
+    def sql_table(cls, query, result, comment=None, links=True) -> str:
+        if not result:
+            rows = []
+        elif isinstance(result, list):
+            rows = result
+        else:
+            rows = [result]
+        keys = list(rows[0].keys()) if rows else []
+
+        table_header = ''.join(f'<th>{escape(str(x))}</th>' for x in keys)
+        table_body = []
+        for row in rows[:cls.max_rows]:
+            cells = ''.join(f'<td>{cls._cell(x)}</td>' for x in row.values())
+            table_body.append(f'<tr>{cells}</tr>')
+        if len(rows) > cls.max_rows:
+            artifact = cls._rows_artifact(rows) if links else None
+            table_body.append(
+                f'<tr><td colspan="{len(keys)}">... {cls.max_rows} of '
+                f'{len(rows)} rows are shown{cls._link(artifact)}</td></tr>')
+
+        return f'''
+                <div class="extra_block">
+                    <p>{escape(str(comment or ''))}<p>
+                    <pre>{cls.text(str(query or ''))}</pre>
+                    <table>
+                        <tr>{table_header}</tr>
+                        <tbody>{''.join(table_body)}</tbody>
+                    </table>
+                </div>
+            '''
+
+    @classmethod
+    def save_artifact(cls, data: bytes, suffix: str):
+        """Saves data to AttachmentStore, returns its url from the report."""
+        if not cls._can_link():
+            return None
+        path = AttachmentStore.put(data, suffix)
+        return Path(os.path.relpath(path, cls.report_dir)).as_posix()
+
+    @classmethod
+    def _can_link(cls) -> bool:
+        return cls.report_dir is not None and AttachmentStore.enabled()
+
+    @classmethod
+    def _link(cls, artifact) -> str:
+        if artifact is None or not cls._can_link():
+            return ''
+        return f', {cls._anchor(cls.save_artifact(*artifact()))}'
+
+    @staticmethod
+    def _anchor(url: str) -> str:
+        return f'<a href="{escape(url)}" target="_blank">full content</a>'
+
+    @classmethod
+    def _cell(cls, value) -> str:
+        text = str(value)
+        if len(text) > cls.max_cell_size:
+            text = text[:cls.max_cell_size] + '...'
+        return escape(text)
+
+    @staticmethod
+    def _rows_artifact(rows):
+        def artifact():
+            data = json.dumps(rows, ensure_ascii=False, indent=2, default=str)
+            return data.encode('utf-8'), '.json'
+
+        return artifact
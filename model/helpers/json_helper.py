@@ -1,6 +1,12 @@
 import json
 from datetime import datetime
 
+from utils.altcollections import (
+    ExtDictView,
+    ListView
+)
+from .parse_cache import ParseCache
+
 
 class SchemaNotFoundError(Exception):
     pass
@@ -24,8 +30,7 @@ class JsonHelper:
 
     @staticmethod
     def parse(file_path):
-        with open(file_path, 'r', encoding='utf-8') as file:
-            return json.load(file)
+        return ParseCache.load(file_path, json.load)
 
     @staticmethod
     def _locate_file(file_name, dirs):
@@ -46,6 +51,8 @@ class AlternateJsonEncoder(json.JSONEncoder):
     def default(self, o):
         if isinstance(o, datetime):
             return o.isoformat()
+        if isinstance(o, (ExtDictView, ListView)):
+            return o.unwrap()
         if isinstance(o, bytes):
             import ast
             return ast.literal_eval(o.decode())
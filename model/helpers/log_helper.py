@@ -1,9 +1,17 @@
 import urllib.parse
-from copy import deepcopy
+import warnings
+from contextvars import ContextVar
+from typing import NamedTuple
 
 import allure
 import pytest_html.extras
 
+from .html_renderer import HtmlRenderer
+from .logger import (
+    RequestRecord,
+    ResponseRecord
+)
+
 
 class BaseLogger:
     @staticmethod
@@ -38,7 +46,8 @@ class AllureLogger(BaseLogger):
 class PytestHTMLLogger(BaseLogger):
 
     def extra_request(self, request, service):
-        log = self.__html_log(self._pretty_request(request, service))
+        log = self.__html_log(
+            HtmlRenderer.text(self._pretty_request(request, service)))
 
         return pytest_html.extras.html(log)
 
@@ -49,9 +58,10 @@ class PytestHTMLLogger(BaseLogger):
         padding: 5px;
         border: 1px solid #e6e6e6;
         '''
-        message = str(response)
-        if len(message) > 1000000:
-            message = str(response).split('\n')[0]
+        if not isinstance(response, ResponseRecord):
+            response = ResponseRecord(response)
+        message = HtmlRenderer.text(response.iter_str(),
+                                    artifact=response.artifact)
         log = self.__html_log(message, style)
 
         return pytest_html.extras.html(log)
@@ -61,21 +71,46 @@ class PytestHTMLLogger(BaseLogger):
         return f'<pre style="{style}">{message}</pre>'
 
 
+class CurrentCall(NamedTuple):
+    service: object = None
+    request: RequestRecord = None
+    response: ResponseRecord = None
+
+
+class _DeprecatedCurrent:
+    """LogHelper.current_<field>: the field of LogHelper.current()."""
+
+    def __set_name__(self, owner, name):
+        self.name = name
+        self.field = name[len('current_'):]
+
+    def __get__(self, instance, owner):
+        warnings.warn(f'LogHelper.{self.name} is deprecated, use '
+                      f'LogHelper.current().{self.field}',
+                      DeprecationWarning, stacklevel=2)
+        return getattr(owner.current(), self.field)
+
+
 class LogHelper:
-    current_service = None
-    current_response = None
-    current_request = None
+    # The last call of the current test or task, see set()
+    _current: ContextVar = ContextVar('log_helper_current',
+                                      default=CurrentCall())
     allure = AllureLogger()
     html = PytestHTMLLogger()
+    current_service = _DeprecatedCurrent()
+    current_request = _DeprecatedCurrent()
+    current_response = _DeprecatedCurrent()
 
     @classmethod
     def set(cls, service, request, response):
-        LogHelper.current_request = deepcopy(request)
-        LogHelper.current_response = deepcopy(response)
-        LogHelper.current_service = service
+        cls._current.set(CurrentCall(service,
+                                     RequestRecord(request),
+                                     ResponseRecord(response)))
+
+    @classmethod
+    def current(cls) -> CurrentCall:
+        return cls._current.get()
 
     @classmethod
     def clear(cls):
-        cls.current_service = None
-        cls.current_response = None
-        cls.current_request = None
+        cls._current.set(CurrentCall())
@@ -1,13 +1,34 @@
 # -*- coding: utf-8 -*-
-from copy import deepcopy
+import pickle
+import sys
+import tempfile
+import threading
+from collections import deque
+from contextvars import (
+    ContextVar,
+    copy_context
+)
+from functools import (
+    partial,
+    wraps
+)
+from html import escape
 
 import allure
 import pytest_html.extras
+from requests.structures import CaseInsensitiveDict
 
 from my_config import (
     is_needed_request_logs,
-    is_needed_sql_logs
+    is_needed_sql_logs,
+    log_max_bytes,
+    log_max_items,
+    log_max_spill_bytes
 )
+from .attachment_store import AttachmentStore
+from .attachment_writer import AttachmentWriter
+from .html_renderer import HtmlRenderer
+from .traffic_log import TrafficLog
 
 
 class LogItem:
@@ -18,22 +39,261 @@ class LogItem:
         self.data = data
 
 
+class LogStore:
+    """
+    Bounded storage of log items of the current test.
+    At most 'max_items' items of 'max_bytes' (estimated) are kept in
+    memory, older items are pickled to a temporary file, which is read back
+    only when the log is rendered. Items which do not fit into
+    'max_spill_bytes' of the file are dropped, the counters of dropped
+    items are shown as the last item of the log.
+    """
+
+    def __init__(self,
+                 max_items: int = log_max_items,
+                 max_bytes: int = log_max_bytes,
+                 max_spill_bytes: int = log_max_spill_bytes,
+                 test_id: str = None):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.max_spill_bytes = max_spill_bytes
+        # nodeid of the test, None for the log outside of tests
+        self.test_id = test_id
+        self._items = deque()
+        self._bytes = 0
+        self._spill_file = None
+        # Items can be appended by threads of the test
+        self._lock = threading.RLock()
+        self.spilled = 0
+        self.spilled_bytes = 0
+        self.dropped = 0
+        self.dropped_bytes = 0
+
+    def __len__(self):
+        return self.spilled + len(self._items)
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def __iter__(self):
+        with self._lock:
+            items = []
+            if self._spill_file is not None:
+                self._spill_file.seek(0)
+                items = [pickle.load(self._spill_file)
+                         for _ in range(self.spilled)]
+                self._spill_file.seek(0, 2)
+            items.extend(item for item, _ in self._items)
+            if self.dropped:
+                items.append(self.summary())
+        return iter(items)
+
+    def append(self, item):
+        size = self.estimate_size(item)
+        with self._lock:
+            self._items.append((item, size))
+            self._bytes += size
+            # The last item is kept in memory even if it exceeds the budget
+            while len(self._items) > 1 and (len(self._items) > self.max_items
+                                            or self._bytes > self.max_bytes):
+                old_item, old_size = self._items.popleft()
+                self._bytes -= old_size
+                self._spill(old_item, old_size)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._bytes = 0
+            if self._spill_file is not None:
+                self._spill_file.close()
+                self._spill_file = None
+            self.spilled = self.spilled_bytes = 0
+            self.dropped = self.dropped_bytes = 0
+
+    def summary(self):
+        return LogItem('text', f'Log limit exceeded: {self.dropped} items '
+                               f'(~{self.dropped_bytes} bytes) were dropped')
+
+    def _spill(self, item, size):
+        if self.spilled_bytes + size <= self.max_spill_bytes:
+            try:
+                data = pickle.dumps(item, protocol=pickle.HIGHEST_PROTOCOL)
+            except Exception:
+                pass
+            else:
+                if self._spill_file is None:
+                    self._spill_file = tempfile.TemporaryFile(
+                        prefix='qa_log_')
+                self._spill_file.write(data)
+                self.spilled += 1
+                self.spilled_bytes += len(data)
+                return
+        self.dropped += 1
+        self.dropped_bytes += size
+
+    @staticmethod
+    def estimate_size(item) -> int:
+        data = item.data
+        if not isinstance(data, dict):
+            return len(str(data))
+        size = 0
+        for value in data.values():
+            if hasattr(value, 'size'):
+                size += value.size
+            elif isinstance(value, (list, tuple)):
+                # SQL rows
+                size += sum(sum(sys.getsizeof(x) for x in row.values())
+                            if isinstance(row, dict) else sys.getsizeof(row)
+                            for row in value)
+            elif isinstance(value, dict):
+                size += sum(sys.getsizeof(x) for x in value.values())
+            else:
+                size += sys.getsizeof(value)
+        return size
+
+
+class RequestRecord:
+    """
+    Immutable snapshot of a request for the log: the request is rendered
+    once, the test can modify or reuse the source Request afterwards.
+    """
+    __slots__ = ('method', 'url', 'path_url', 'query_string',
+                 'formatted_headers', 'formatted_body', '_text')
+
+    def __init__(self, request):
+        self.method = request.method
+        self.url = request.url
+        self.path_url = request.path_url
+        self.query_string = request.query_string
+        self.formatted_headers = request.formatted_headers
+        self.formatted_body = request.formatted_body
+        self._text = str(request)
+
+    def __str__(self):
+        return self._text
+
+    @property
+    def size(self) -> int:
+        return len(self._text)
+
+
+class ResponseRecord:
+    """
+    Compact snapshot of a response for the log: status, reason, headers,
+    timing and a reference to the original 'requests' response, whose
+    content is immutable bytes. Response.body is not referenced, so the
+    test can modify it freely, and nothing is copied: the text is rendered
+    from the original content on the first str() call.
+    """
+    __slots__ = ('status', 'reason', 'url', 'headers', 'elapsed',
+                 '_original', '_build', '_text')
+
+    def __init__(self, response):
+        self.status = response.status
+        self.reason = response.reason
+        self.url = response.url
+        self.headers = CaseInsensitiveDict(response.headers or {})
+        self._original = response.original_response
+        self._build = type(response).build
+        if self._original is not None:
+            self.elapsed = self._original.elapsed
+            self._text = None
+        else:
+            # Built by hand: nothing immutable to refer to
+            self.elapsed = None
+            self._text = str(response)
+
+    def __str__(self):
+        if self._text is None:
+            self._text = str(self._build(self._original))
+        return self._text
+
+    def iter_str(self):
+        """str() in chunks, see HtmlRenderer.text(). The response is built
+        once: the text is kept if the chunks are read to the end."""
+        if self._text is not None:
+            yield self._text
+            return
+        chunks = []
+        for chunk in self._build(self._original).iter_str():
+            chunks.append(chunk)
+            yield chunk
+        self._text = ''.join(chunks)
+
+    def digest(self):
+        """Digest of status and content, None for responses built by hand."""
+        if self._original is None:
+            return None
+        return AttachmentStore.digest(
+            f'{self.status} {self.reason}\n'.encode('utf-8')
+            + (self._original.content or b''))
+
+    def artifact(self) -> tuple:
+        """Full content and file suffix for HtmlRenderer."""
+        if self._original is None:
+            return self._text.encode('utf-8'), '.txt'
+        content_type = self.headers.get('content-type', '')
+        suffix = '.json' if 'json' in content_type else '.txt'
+        return self._original.content or b'', suffix
+
+    @property
+    def size(self) -> int:
+        if self._text is not None:
+            return len(self._text)
+        return len(self._original.content or b'')
+
+
+# Log of the current test, set by the plugin for every test. Asyncio tasks
+# inherit it, threads have to be started via Logger.wrap()
+_collector: ContextVar = ContextVar('log_collector', default=None)
+
+
+class _CurrentItems:
+    """Logger.items: LogStore of the current test, default_items outside
+    of tests."""
+
+    def __get__(self, instance, owner) -> LogStore:
+        collector = _collector.get()
+        return owner.default_items if collector is None else collector
+
+
 class Logger:
-    items: list = []
+    # Log outside of tests, e.g. of threads not started via wrap(). It is
+    # rendered after the log of the running test (see rendered_items())
+    # and is cleared when the next test starts
+    default_items: LogStore = LogStore()
+    # Log items of the current test
+    items = _CurrentItems()
     log_request_reponse: bool = is_needed_request_logs
     log_sql: bool = is_needed_sql_logs
+    # Render logs of passed tests too (--log-passed), by default items are
+    # kept raw and rendered only for failed and skipped tests
+    log_passed: bool = False
 
     @classmethod
-    def append_http(cls, request, response, comment=None):
+    def append_http(cls, request, response, comment=None, template=None):
+        """'template' - path of the endpoint before substitution."""
+        if TrafficLog.enabled:
+            TrafficLog.write_http(request, response, template,
+                                  test=cls.items.test_id)
+        if not cls.log_request_reponse:
+            return
         item = LogItem('http', {
-            'request': request,
-            'response': response,
+            'request': RequestRecord(request),
+            'response': ResponseRecord(response),
             'comment': comment
         })
         cls.append(item)
 
     @classmethod
-    def append_sql(cls, query, result, comment=None):
+    def append_sql(cls, query, result, comment=None, elapsed=None,
+                   rows=None):
+        """'rows' - count of rows if 'result' is a sample of them."""
+        if TrafficLog.enabled:
+            TrafficLog.write_sql(query, result, elapsed, rows,
+                                 test=cls.items.test_id)
+        if not cls.log_sql:
+            return
         item = LogItem('sql_query', {
             'query': query,
             'result': result,
@@ -45,9 +305,55 @@ class Logger:
     def append_text(cls, item):
         cls.append(LogItem('text', item))
 
+    @classmethod
+    def rendered_items(cls) -> list:
+        """Log items of the current test, followed by items logged
+        meanwhile by threads which were not started via wrap()."""
+        items = list(cls.items)
+        if cls.items is not cls.default_items and cls.default_items:
+            items.append(LogItem('text', 'Logged outside of the test '
+                                         '(threads not started via '
+                                         'Logger.wrap()):'))
+            items.extend(cls.default_items)
+        return items
+
+    @classmethod
+    def start_test(cls, test_id: str = None):
+        """Sets a new collector for the current context, returns a token."""
+        cls.default_items.clear()
+        return _collector.set(LogStore(test_id=test_id))
+
+    @classmethod
+    def finish_test(cls, token):
+        _collector.get().clear()
+        _collector.reset(token)
+
+    @classmethod
+    def wrap(cls, function):
+        """
+        Runs 'function' in the context of the caller, so that its log items
+        go to the current test. Usage:
+            executor.submit(Logger.wrap(endpoint), ...)
+            threading.Thread(target=Logger.wrap(func)).start()
+        """
+        context = copy_context()
+
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            return context.copy().run(function, *args, **kwargs)
+
+        return wrapper
+
+    @classmethod
+    def clear(cls):
+        cls.items.clear()
+        cls.default_items.clear()
+
     @classmethod
     def append(cls, item):
-        cls.items.append(deepcopy(item))
+        # Items hold snapshots (see RequestRecord, ResponseRecord), text and
+        # SQL rows which are not returned to the test, so nothing is copied
+        cls.items.append(item)
 
     @classmethod
     def pytest_html_attach(cls, item: LogItem, comment=None):
@@ -55,20 +361,27 @@ class Logger:
         if item.type == 'text':
             log = f'''
                 <div class="extra_block">
-                    <p>{item.data}<p>
+                    <p>{escape(str(item.data))}<p>
                 </div>
             '''
         elif item.type == 'http':
             comment = item.data.get('comment') or comment
             request = item.data.get('request')
             response = item.data.get('response')
+            request_html = HtmlRenderer.text(str(request or ''))
+            response_html = HtmlRenderer.text(
+                response.iter_str(),
+                artifact=response.artifact,
+                key=response.digest(),
+                summary=f'HTTP status: {response.status} {response.reason}'
+            ) if response else ''
 
             log = f'''
                 <div class="extra_block">
-                    <p>{comment or ''}<p>
-                    <pre class="extra_request">{request or ''}</pre>
+                    <p>{escape(str(comment or ''))}<p>
+                    <pre class="extra_request">{request_html}</pre>
                     <hr>
-                    <pre class="extra_response">{response or ''}</pre>
+                    <pre class="extra_response">{response_html}</pre>
                 </div>
             '''
         elif item.type == 'sql_query':
@@ -85,14 +398,15 @@ class Logger:
             with allure.step(
                     comment or f'{request.method} {request.url}'
             ):
-                allure.attach(
+                AttachmentWriter.attach(
                     name='Request',
                     body=str(request),
                     attachment_type=allure.attachment_type.JSON
                 )
-                allure.attach(
+                # Rendered by the writer thread with --async-attachments
+                AttachmentWriter.attach(
                     name=f'Response -> {response.status} {response.reason}, ',
-                    body=str(response),
+                    body=response.__str__,
                     attachment_type=allure.attachment_type.JSON
                 )
         elif item.type == 'sql_query':
@@ -100,40 +414,16 @@ class Logger:
             comment = item.data.get('comment')
 
             with allure.step(comment or query):
-                allure.attach(
+                AttachmentWriter.attach(
                     name='SQL Query',
-                    body=cls._html_from_sql_item(item),
+                    body=partial(cls._html_from_sql_item, item, links=False),
                     attachment_type=allure.attachment_type.HTML
                 )
 
     @staticmethod
-    def _html_from_sql_item(item: LogItem) -> str:
-        query = item.data.get('query')
-        result = item.data.get('result')
-        comment = item.data.get('comment')
-
-        table_header = []
-        table_body = []
-        if result:
-            if isinstance(result, list):
-                keys = result[0].keys()
-                rows = result
-            else:
-                keys = result.keys()
-                rows = [result]
-            table_header = [f'<th>{x}</th>' for x in keys]
-            for row in rows:
-                table_row_cells = [f'<td>{x}</td>' for x in row.values()]
-                table_row = f'<tr>{"".join(table_row_cells)}</tr>'
-                table_body.append(table_row)
-
-        return f'''
-                <div class="extra_block">
-                    <p>{comment or ''}<p>
-                    <pre>{query or ''}</pre>
-                    <table>
-                        <tr>{' '.join(table_header)}</tr>
-                        <tbody>{''.join(table_body)}</tbody>
-                    </table>
-                </div>
-            '''
+    def _html_from_sql_item(item: LogItem, links=True) -> str:
+        """'links' - link the full result saved next to the HTML report."""
+        return HtmlRenderer.sql_table(item.data.get('query'),
+                                      item.data.get('result'),
+                                      comment=item.data.get('comment'),
+                                      links=links)
@@ -0,0 +1,109 @@
+import hashlib
+import os
+import pickle
+from collections import OrderedDict
+from pathlib import Path
+from threading import Lock
+from typing import (
+    Callable,
+    Optional
+)
+
+
+class ParseCache:
+    """
+    Cache of parsed data and schema files.
+
+    Parsed content is kept as a pickled blob in two layers:
+    - an in-process LRU keyed by (loader, path, size, mtime);
+    - a persistent store on disk (usually inside .pytest_cache), so xdist
+        workers and subsequent runs do not parse the same files again.
+    Every call unpickles the blob, so each caller gets its own copy and
+    can modify it without corrupting the cache. Content which can not be
+    pickled is not cached, the file is parsed on every call.
+    Trust: blobs on disk are unpickled as is, the cache directory must be
+    writable only by the user running the tests (as .pytest_cache is).
+    """
+    cache_dir: Optional[Path] = None
+    max_items: int = 256
+
+    _memory: OrderedDict = OrderedDict()
+    _lock = Lock()
+
+    @classmethod
+    def load(cls, file_path, loader: Callable, encoding='utf-8'):
+        """Returns parsed content of the file, 'loader' accepts file object."""
+        path = Path(file_path).resolve()
+        stat = path.stat()
+        kind = f'{loader.__module__}.{loader.__qualname__}'
+        key = (kind, str(path), stat.st_size, stat.st_mtime_ns)
+
+        with cls._lock:
+            blob = cls._memory.get(key)
+            if blob is not None:
+                cls._memory.move_to_end(key)
+        if blob is None:
+            blob = cls._read_disk(key)
+            if blob is None:
+                with open(path, 'r', encoding=encoding) as file:
+                    content = loader(file)
+                try:
+                    blob = pickle.dumps(content,
+                                        protocol=pickle.HIGHEST_PROTOCOL)
+                except (pickle.PicklingError, TypeError, AttributeError):
+                    # E.g. a YAML tag constructing an object with a lock
+                    return content
+                cls._write_disk(key, blob)
+            cls._remember(key, blob)
+        return pickle.loads(blob)
+
+    @classmethod
+    def clear(cls):
+        with cls._lock:
+            cls._memory.clear()
+
+    @classmethod
+    def _remember(cls, key, blob):
+        with cls._lock:
+            cls._memory[key] = blob
+            cls._memory.move_to_end(key)
+            while len(cls._memory) > cls.max_items:
+                cls._memory.popitem(last=False)
+
+    @classmethod
+    def _disk_path(cls, key) -> Optional[Path]:
+        if cls.cache_dir is None:
+            return None
+        kind, path = key[:2]
+        name = hashlib.sha1(f'{kind}:{path}'.encode('utf-8')).hexdigest()
+        return Path(cls.cache_dir) / f'{name}.pickle'
+
+    @classmethod
+    def _read_disk(cls, key) -> Optional[bytes]:
+        disk_path = cls._disk_path(key)
+        if disk_path is None or not disk_path.exists():
+            return None
+        try:
+            with open(disk_path, 'rb') as file:
+                stored_key, blob = pickle.load(file)
+        except (OSError, EOFError, pickle.UnpicklingError, ValueError):
+            return None
+        # Entry is stale if the source file was changed (size or mtime)
+        return blob if stored_key == key else None
+
+    @classmethod
+    def _write_disk(cls, key, blob):
+        disk_path = cls._disk_path(key)
+        if disk_path is None:
+            return
+        # Atomic replace: parallel xdist workers may write the same entry
+        tmp_path = disk_path.with_suffix(f'.{os.getpid()}.tmp')
+        try:
+            disk_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp_path, 'wb') as file:
+                pickle.dump((key, blob), file,
+                            protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, disk_path)
+        except OSError:
+            if tmp_path.exists():
+                tmp_path.unlink()
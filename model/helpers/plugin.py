@@ -1,8 +1,21 @@
-from pathlib import PurePath
+from pathlib import (
+    Path,
+    PurePath
+)
 
 import pytest
 
+from .attachment_writer import AttachmentWriter
+from .html_renderer import HtmlRenderer
+from .log_helper import LogHelper
 from .logger import Logger
+from .snapshot import Snapshot
+from .traffic_log import TrafficLog
+from .yaml_helper import YamlHelper
+
+
+# A phase of the test did not pass, logs of all its phases are rendered
+_log_rendered = pytest.StashKey[bool]()
 
 
 def pytest_cmdline_preparse(config, args):
@@ -11,6 +24,41 @@ def pytest_cmdline_preparse(config, args):
         args.append(f'--css={style_path}')
 
 
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_protocol(item, nextitem):
+    # Log collector of the test, see Logger.items
+    token = Logger.start_test(item.nodeid)
+    HtmlRenderer.start_test()
+    try:
+        yield
+    finally:
+        Logger.finish_test(token)
+        LogHelper.clear()
+
+
+def pytest_runtest_setup(item):
+    test_path = Path(item.path)
+    service_dir = next((x for x in YamlHelper.services_dirs
+                        if x in test_path.parents), test_path.parent)
+    module = test_path.relative_to(service_dir).with_suffix('')
+    Snapshot.activate(service_dir, module.as_posix(),
+                      item.nodeid.split('::', 1)[-1])
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_teardown(item):
+    # Snapshots are available to fixture finalizers as well
+    yield
+    Snapshot.deactivate()
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_sessionfinish(session):
+    # Flush barrier: all attachments are written before the session ends
+    AttachmentWriter.stop()
+    TrafficLog.close()
+
+
 @pytest.mark.optionalhook
 def pytest_html_results_table_header(cells):
     cells.pop()
@@ -23,7 +71,8 @@ def pytest_html_results_table_row(report, cells):
 
 @pytest.mark.optionalhook
 def pytest_html_results_table_html(report, data):
-    if report.passed:
+    if report.passed and not getattr(report, 'log_rendered',
+                                     Logger.log_passed):
         del data[-1]
 
 
@@ -41,16 +90,24 @@ def pytest_runtest_makereport(
         statuses.append('setup')
     if report.when in statuses:
         comment = 'teardown' if report.when == 'teardown' else None
-        if item.config.getoption('--html'):
+        # Formatting is a noticeable share of CPU, skip it when the log
+        # is not shown anyway. Once a phase fails the logs of the later
+        # phases (e.g. teardown cleanup) are rendered as well
+        if not report.passed:
+            item.stash[_log_rendered] = True
+        render = item.stash.get(_log_rendered, False) or Logger.log_passed
+        report.log_rendered = render
+        log_items = Logger.rendered_items()
+        if render and (item.config.getoption('--html')
+                       or item.config.getoption('--sharded-report')):
             extra = [
                 Logger.pytest_html_attach(log_item, comment=comment)
-                for log_item in Logger.items if hasattr(Logger, 'items')
+                for log_item in log_items
             ]
 
             report.extra = extra
-        if item.config.getoption('--alluredir'):
-            for log_item in Logger.items:
+        if render and item.config.getoption('--alluredir'):
+            for log_item in log_items:
                 Logger.allure_attach(log_item,
                                      comment=comment)
-        if hasattr(Logger, 'items'):
-            Logger.items = []
+        Logger.clear()
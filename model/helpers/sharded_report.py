@@ -0,0 +1,243 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+from html import (
+    escape,
+    unescape
+)
+from pathlib import Path
+
+from .attachment_store import AttachmentStore
+from .html_renderer import HtmlRenderer
+
+
+INDEX_TEMPLATE = '''<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<link rel="stylesheet" href="style.css">
+<style>
+table.results {{ border-collapse: collapse; width: 100%; }}
+table.results td, table.results th {{ border: 1px solid #e6e6e6;
+    padding: 3px 6px; text-align: left; }}
+tr.test {{ cursor: pointer; }}
+.passed {{ color: green; }} .failed, .error {{ color: red; }}
+.skipped, .xfailed, .xpassed {{ color: orange; }}
+</style>
+</head>
+<body>
+<h1>{title}</h1>
+<p id="totals"></p>
+<p>Filter: <input id="filter" size="60"></p>
+<table class="results">
+<thead><tr><th>Result</th><th>Test</th><th>Duration, s</th></tr></thead>
+<tbody id="tests"></tbody>
+</table>
+<script src="summary.js"></script>
+<script>
+var shards = {{}};
+window.loadShard = function (id, data) {{
+    shards[id] = data;
+    show(id);
+}};
+function show(id) {{
+    var row = document.getElementById('details-' + id);
+    var data = shards[id];
+    var html = '';
+    if (data.longrepr) {{
+        var pre = document.createElement('pre');
+        pre.textContent = data.longrepr;
+        html += pre.outerHTML;
+    }}
+    data.extras.forEach(function (extra) {{ html += extra; }});
+    row.firstChild.innerHTML = html || 'No details';
+}}
+function toggle(test) {{
+    var row = document.getElementById('details-' + test.id);
+    if (row) {{
+        row.parentNode.removeChild(row);
+        return;
+    }}
+    row = document.createElement('tr');
+    row.id = 'details-' + test.id;
+    row.innerHTML = '<td colspan="3">Loading...</td>';
+    document.getElementById('row-' + test.id).after(row);
+    if (shards[test.id]) {{
+        show(test.id);
+    }} else {{
+        var script = document.createElement('script');
+        script.src = 'shards/' + test.id + '.js';
+        document.body.appendChild(script);
+    }}
+}}
+function render() {{
+    var filter = document.getElementById('filter').value;
+    var body = document.getElementById('tests');
+    body.innerHTML = '';
+    reportSummary.tests.forEach(function (test) {{
+        if (filter && (test.nodeid + ' ' + test.outcome).indexOf(filter) < 0) {{
+            return;
+        }}
+        var row = document.createElement('tr');
+        row.id = 'row-' + test.id;
+        row.className = 'test';
+        row.innerHTML = '<td class="' + test.outcome + '">' + test.outcome +
+            '</td><td></td><td>' + test.duration.toFixed(2) + '</td>';
+        row.children[1].textContent = test.nodeid;
+        row.onclick = function () {{ toggle(test); }};
+        body.appendChild(row);
+    }});
+}}
+document.getElementById('totals').textContent = Object.keys(
+    reportSummary.totals).map(function (key) {{
+        return key + ': ' + reportSummary.totals[key];
+    }}).join(', ') + ', duration: ' + reportSummary.duration + ' s';
+document.getElementById('filter').oninput = render;
+render();
+</script>
+</body>
+</html>
+'''
+
+
+class ShardedReport:
+    """
+    HTML report for big runs (--sharded-report DIR), an alternative to
+    the self-contained pytest-html report:
+        DIR/index.html - list of tests, details are loaded on click;
+        DIR/summary.json - totals and results of tests for tools
+            (DIR/summary.js - the same for index.html);
+        DIR/shards/<test id>.js - failure and Logger extras of one test;
+        DIR/attachments/ - full content of truncated blocks;
+        DIR/style.css - copy of model/helpers/style.css.
+    Shards are written when a test finishes, so memory does not grow with
+    the number of tests. Shards are plain scripts, so the report works
+    when opened from disk (file://) as well.
+    With --html the extras link AttachmentStore next to the pytest-html
+    report, such objects are hard-linked into DIR/attachments, so rotation
+    and cleanup of either report do not break links of the other one.
+    """
+    title = 'Test report'
+    _href = re.compile(r'href="([^"]+)"')
+
+    def __init__(self, directory, style_path=None):
+        self.directory = Path(directory)
+        self.attachments = self.directory / 'attachments'
+        self.shards = self.directory / 'shards'
+        self.shards.mkdir(parents=True, exist_ok=True)
+        if style_path and Path(style_path).exists():
+            shutil.copyfile(style_path, self.directory / 'style.css')
+        self.started = time.time()
+        self.tests = {}
+
+    def pytest_runtest_logreport(self, report):
+        test_id = hashlib.sha1(report.nodeid.encode('utf-8')).hexdigest()[:16]
+        test = self.tests.setdefault(report.nodeid, {
+            'id': test_id,
+            'nodeid': report.nodeid,
+            'outcome': 'passed',
+            'duration': 0.0,
+            'longrepr': [],
+            'extras': []
+        })
+        test['duration'] += getattr(report, 'duration', 0.0)
+        outcome = self._outcome(report)
+        if outcome != 'passed' and test['outcome'] in ('passed', 'skipped'):
+            test['outcome'] = outcome
+        if report.failed or report.skipped:
+            test['longrepr'].append(f'[{report.when}] {report.longreprtext}')
+        test['extras'].extend(self._extras(report))
+        if report.when == 'teardown':
+            self._write_shard(test)
+
+    def pytest_sessionfinish(self, session):
+        tests = [{'id': test['id'],
+                  'nodeid': test['nodeid'],
+                  'outcome': test['outcome'],
+                  'duration': round(test['duration'], 3)}
+                 for test in self.tests.values()]
+        totals = {}
+        for test in tests:
+            totals[test['outcome']] = totals.get(test['outcome'], 0) + 1
+        summary = {
+            'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'duration': round(time.time() - self.started, 2),
+            'totals': totals,
+            'tests': tests
+        }
+        data = json.dumps(summary, ensure_ascii=False)
+        self._write('summary.json', data)
+        self._write('summary.js', f'window.reportSummary = {data};\n')
+        self._write('index.html',
+                    INDEX_TEMPLATE.format(title=escape(self.title)))
+
+    def _write_shard(self, test):
+        data = json.dumps({'longrepr': '\n\n'.join(test['longrepr']),
+                           'extras': test['extras']}, ensure_ascii=False)
+        self._write(f'shards/{test["id"]}.js',
+                    f'window.loadShard("{test["id"]}", {data});\n')
+        # Only the summary is kept in memory, reports of reruns start
+        # a new shard
+        test['longrepr'] = []
+        test['extras'] = []
+
+    def _write(self, name, content):
+        path = self.directory / name
+        tmp_path = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+        tmp_path.write_text(content, encoding='utf-8')
+        os.replace(tmp_path, path)
+
+    def _localize(self, html: str) -> str:
+        """Makes links to AttachmentStore objects outside of the report
+        directory point to their copies in DIR/attachments."""
+        base = HtmlRenderer.report_dir
+        if base is None or not AttachmentStore.enabled() \
+                or Path(base).absolute() == self.directory.absolute():
+            return html
+        store = Path(AttachmentStore.directory).absolute()
+
+        def replace(match):
+            source = Path(os.path.normpath(
+                Path(base, unescape(match.group(1))).absolute()))
+            if store not in source.parents or not source.is_file():
+                return match.group(0)
+            target = self.attachments / source.parent.name / source.name
+            if not target.exists():
+                target.parent.mkdir(parents=True, exist_ok=True)
+                try:
+                    os.link(source, target)
+                except FileExistsError:
+                    pass
+                except OSError:
+                    # E.g. different file systems
+                    shutil.copyfile(source, target)
+            url = target.relative_to(self.directory).as_posix()
+            return f'href="{escape(url)}"'
+
+        return self._href.sub(replace, html)
+
+    @staticmethod
+    def _outcome(report) -> str:
+        if hasattr(report, 'wasxfail'):
+            return 'xfailed' if report.skipped else 'xpassed'
+        if report.failed:
+            return 'failed' if report.when == 'call' else 'error'
+        return report.outcome
+
+    def _extras(self, report) -> list:
+        result = []
+        for extra in getattr(report, 'extra', None) or []:
+            format_type = extra.get('format_type', extra.get('format'))
+            content = extra.get('content', '')
+            if format_type == 'html':
+                result.append(self._localize(content))
+            elif format_type == 'url':
+                url = escape(content)
+                result.append(f'<p><a href="{url}">{url}</a></p>')
+            else:
+                result.append(f'<pre>{escape(str(content))}</pre>')
+        return result
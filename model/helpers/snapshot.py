@@ -0,0 +1,209 @@
+import hashlib
+import json
+import os
+import re
+import warnings
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Optional
+
+from utils.altcollections import DICTS
+from utils.canonical_hash import canonical_digest
+from utils.json_pretty_print import json_pretty_print
+from utils.jsondiff import (
+    JsonDiff,
+    PathPatterns
+)
+from .json_helper import AlternateJsonEncoder
+
+
+class SnapshotNotFoundError(Exception):
+    pass
+
+
+class SnapshotStore:
+    """
+    Content-addressed storage of snapshots of a service:
+        <service>/snapshots/objects/<aa>/<digest>.json - normalized data;
+        <service>/snapshots/refs/<module path>/[<class>/]<test>.json -
+            {snapshot name: digest} for every test.
+    Identical data recorded by different tests is stored once.
+    """
+    _instances = {}
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self.objects = self.directory / 'objects'
+        self.refs = self.directory / 'refs'
+
+    @classmethod
+    def for_dir(cls, directory: Path) -> 'SnapshotStore':
+        directory = Path(directory)
+        if directory not in cls._instances:
+            cls._instances[directory] = cls(directory)
+        return cls._instances[directory]
+
+    def put(self, data, digest: str) -> Path:
+        path = self._object_path(digest)
+        if not path.exists():
+            self._write(path, json.dumps(data,
+                                         indent=2,
+                                         sort_keys=True,
+                                         ensure_ascii=False,
+                                         cls=AlternateJsonEncoder) + '\n')
+        return path
+
+    def get(self, digest: str):
+        path = self._object_path(digest)
+        if not path.exists():
+            raise SnapshotNotFoundError(f'Снапшот {digest} не найден!')
+        with open(path, encoding='utf-8') as file:
+            return json.load(file)
+
+    def read_refs(self, module: str, test: str) -> dict:
+        path = self._refs_path(module, test)
+        if not path.exists():
+            return {}
+        with open(path, encoding='utf-8') as file:
+            return json.load(file)
+
+    def write_refs(self, module: str, test: str, refs: dict):
+        self._write(self._refs_path(module, test),
+                    json.dumps(refs, indent=2, sort_keys=True) + '\n')
+
+    def _object_path(self, digest: str) -> Path:
+        return self.objects / digest[:2] / f'{digest}.json'
+
+    def _refs_path(self, module: str, test: str) -> Path:
+        """'module' - path of the test module relative to the service
+        without suffix, 'test' - class-qualified name ('Class::test[id]')."""
+        *classes, name = test.split('::')
+        directory = self.refs.joinpath(*Path(module).parts,
+                                       *map(self._file_name, classes))
+        return directory / f'{self._file_name(name)}.json'
+
+    @staticmethod
+    def _file_name(name: str) -> str:
+        result = re.sub(r'[^0-9A-Za-z_.-]', '_', name)
+        if result != name:
+            # Different names must not be mapped to the same file
+            digest = hashlib.sha1(name.encode('utf-8')).hexdigest()[:8]
+            result = f'{result}-{digest}'
+        return result
+
+    @staticmethod
+    def _write(path: Path, content: str):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f'.{os.getpid()}.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        os.replace(tmp_path, path)
+
+
+class SnapshotRecordedWarning(UserWarning):
+    pass
+
+
+_current: ContextVar[Optional['Snapshot']] = ContextVar('snapshot',
+                                                        default=None)
+
+
+class Snapshot:
+    """
+    Snapshots of the current test. The plugin activates it for every test,
+    usage: 'assert response.matches_snapshot('name', ignore=['**.id'])'
+    or via 'snapshot' fixture: 'assert snapshot.assert_match(data, 'name')'.
+    A missing snapshot is recorded on the first run (with a warning, so an
+    unexpectedly missing one is visible in the summary), --snapshot-update
+    overwrites mismatched ones.
+    """
+    update: bool = False
+
+    def __init__(self, store: SnapshotStore, module: str, test: str):
+        self.store = store
+        self.module = module
+        self.test = test
+        self._refs = None
+
+    @classmethod
+    def activate(cls, service_dir: Path, module: str, test: str):
+        store = SnapshotStore.for_dir(Path(service_dir) / 'snapshots')
+        snapshot = cls(store, module, test)
+        _current.set(snapshot)
+        return snapshot
+
+    @classmethod
+    def deactivate(cls):
+        _current.set(None)
+
+    @classmethod
+    def get_current(cls) -> 'Snapshot':
+        snapshot = _current.get()
+        if snapshot is None:
+            raise RuntimeError('Snapshots are available only inside a test')
+        return snapshot
+
+    @property
+    def refs(self) -> dict:
+        if self._refs is None:
+            self._refs = self.store.read_refs(self.module, self.test)
+        return self._refs
+
+    def assert_match(self, data, name: str, ignore=None) -> bool:
+        normalized = normalize(data, ignore)
+        digest = canonical_digest(normalized)
+        stored_digest = self.refs.get(name)
+
+        if stored_digest is None:
+            warnings.warn(f'snapshot "{name}" of {self.test} is recorded',
+                          SnapshotRecordedWarning)
+        if stored_digest is None or (self.update and stored_digest != digest):
+            self.store.put(normalized, digest)
+            self.refs[name] = digest
+            self.store.write_refs(self.module, self.test, self.refs)
+            return True
+        if stored_digest == digest:
+            return True
+
+        diff = JsonDiff(self.store.get(stored_digest), normalized)
+        assert not diff, f'snapshot "{name}" does not match, ' \
+                         f'diff={json_pretty_print(diff.to_json())}'
+        return True
+
+
+def normalize(data, ignore=None):
+    """
+    Returns a copy of JSON-like data without the nodes matched by
+    'ignore' glob paths (the same syntax as JsonDiff has).
+    """
+    patterns = PathPatterns(ignore or [])
+    if not patterns.patterns:
+        return data
+
+    root = [None]
+    stack = [(data, root, 0, patterns.initial)]
+    while stack:
+        value, parent, key, states = stack.pop()
+        if type(value) in DICTS:
+            children = [(k, x, patterns.step(states, k, False))
+                        for k, x in value.items()]
+            result = {}
+        elif isinstance(value, (list, tuple)):
+            children = [(i, x, patterns.step(states, i, True))
+                        for i, x in enumerate(value)]
+            result = []
+        else:
+            parent[key] = value
+            continue
+        children = [x for x in children if not patterns.matched(x[2])]
+        if isinstance(result, list):
+            # Ignored items are dropped, the rest are shifted
+            children = [(i, x[1], x[2]) for i, x in enumerate(children)]
+            result.extend([None] * len(children))
+        else:
+            # Keep order of keys, values are set when popped from the stack
+            result.update((x[0], None) for x in children)
+        for child_key, child, child_states in children:
+            stack.append((child, result, child_key, child_states))
+        parent[key] = result
+    return root[0]
@@ -0,0 +1,112 @@
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+
+class TrafficLog:
+    """
+    Structured traffic log (--traffic-log DIR): one compact JSON line per
+    HTTP call or SQL query, written by Logger.append_http / append_sql to
+    DIR/traffic-<xdist worker>.jsonl through a large write buffer.
+    Only scalars are taken from requests and responses, nothing is copied.
+    'test' of a record is the nodeid of the test which made the call (see
+    Logger.start_test), threads of other tests do not mislabel records.
+    Files of the previous run are removed by clean() at the session start,
+    so the directory holds only the current run.
+    Merge and query the files with utils/traffic_index.py.
+    """
+    enabled: bool = False
+    buffer_size: int = 1024 * 1024
+    # Long SQL queries are truncated
+    max_query_length: int = 500
+
+    worker: str = None
+    _file = None
+    # Records are written by threads of tests as well
+    _lock = threading.Lock()
+
+    @classmethod
+    def clean(cls, directory):
+        """Removes traffic files of the previous run, it is called once
+        per session before workers start."""
+        for path in Path(directory).glob('traffic-*.jsonl'):
+            path.unlink()
+
+    @classmethod
+    def open(cls, directory):
+        cls.close()
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        cls.worker = os.getenv('PYTEST_XDIST_WORKER', 'master')
+        cls._file = open(directory / f'traffic-{cls.worker}.jsonl', 'w',
+                         encoding='utf-8', buffering=cls.buffer_size)
+        cls.enabled = True
+
+    @classmethod
+    def close(cls):
+        with cls._lock:
+            if cls._file is not None:
+                cls._file.close()
+                cls._file = None
+            cls.enabled = False
+
+    @classmethod
+    def write_http(cls, request, response, template=None, test=None):
+        original = response.original_response
+        record = {
+            'kind': 'http',
+            'method': request.method,
+            'template': template or request.path_url,
+            'url': response.url,
+            'status': response.status,
+            'elapsed_ms': None,
+            'request_bytes': None,
+            'response_bytes': None
+        }
+        if original is not None:
+            record['elapsed_ms'] = cls._ms(original.elapsed.total_seconds())
+            record['request_bytes'] = cls._body_size(original.request.body)
+            record['response_bytes'] = len(original.content or b'')
+        cls._write(record, test)
+
+    @classmethod
+    def write_sql(cls, query, result, elapsed=None, rows=None, test=None):
+        if rows is None and isinstance(result, list):
+            rows = len(result)
+        elif rows is None:
+            rows = 0 if result is None else 1
+        cls._write({
+            'kind': 'sql',
+            'template': str(query)[:cls.max_query_length],
+            'rows': rows,
+            'elapsed_ms': None if elapsed is None else cls._ms(elapsed)
+        }, test)
+
+    @staticmethod
+    def _body_size(body):
+        """Size of the body in bytes, None for streamed bodies (generators,
+        files) whose size is not known without reading them."""
+        if body is None:
+            return 0
+        elif isinstance(body, str):
+            return len(body.encode('utf-8'))
+        elif isinstance(body, (bytes, bytearray, memoryview)):
+            return len(body)
+        return None
+
+    @staticmethod
+    def _ms(seconds: float) -> float:
+        return round(seconds * 1000, 3)
+
+    @classmethod
+    def _write(cls, record: dict, test=None):
+        record['ts'] = round(time.time(), 3)
+        record['test'] = test
+        record['worker'] = cls.worker
+        line = json.dumps(record, ensure_ascii=False,
+                          separators=(',', ':')) + '\n'
+        with cls._lock:
+            if cls._file is not None:
+                cls._file.write(line)
@@ -1,5 +1,7 @@
 import yaml
 
+from .parse_cache import ParseCache
+
 
 class YamlNotFoundError(Exception):
     pass
@@ -19,8 +21,7 @@ class YamlHelper:
 
     @classmethod
     def parse_file(cls, filepath):
-        with open(filepath, encoding='utf-8') as file:
-            return yaml.unsafe_load(file)
+        return ParseCache.load(filepath, yaml.unsafe_load)
 
     @staticmethod
     def _parse_file(file_name, dirs, service_name=None):
@@ -38,5 +39,4 @@ class YamlHelper:
         if not matches:
             raise YamlNotFoundError(f'Файл {file_name} не найден!')
 
-        with open(matches[0], 'r', encoding='utf-8') as file:
-            return yaml.safe_load(file.read())
+        return ParseCache.load(matches[0], yaml.safe_load)
@@ -5,6 +5,10 @@ from .compare import (
     CompareIgnore,
     CompareIgnoreOrder
 )
+from .matcher import (
+    Matcher,
+    Mismatch
+)
 from .message import Message
 from .request import Request
 from .response import (
@@ -1,9 +1,10 @@
-import json
 from abc import (
     ABC,
     abstractmethod
 )
 
+from utils.canonical_hash import CanonicalHasher
+
 
 class CompareABC(ABC):
 
@@ -25,17 +26,76 @@ class CompareIgnore(CompareABC):
 
 
 class CompareIgnoreOrder(CompareABC):
-
-    def __init__(self, seq, key):
+    """
+    Compares sequences regardless of order of their items.
+    Without 'key' the sequences are compared as multisets of canonical
+    digests of their items, which is O(n) and works for unhashable
+    (dict, list) and mixed items. With 'key' both sequences are sorted
+    by it and compared item by item.
+    """
+
+    def __init__(self, seq, key=None):
         self.seq = seq
         self.key = key
 
     def __eq__(self, other: list):
-        return sorted(self.seq, key=self.key) == sorted(other, key=self.key)
+        if self.key is not None:
+            return sorted(self.seq, key=self.key) == sorted(other,
+                                                            key=self.key)
+        if not isinstance(other, (list, tuple)) or len(other) != len(self.seq):
+            return False
+        hasher = CanonicalHasher()
+        try:
+            return hasher.counter(self.seq) == hasher.counter(other)
+        except TypeError:
+            # Items which have no canonical form (e.g. CompareABC objects)
+            return self._match_items(other)
 
     def __str__(self):
         return f'CompareIgnoreOrder(seq={self.seq})'
 
+    def _match_items(self, other: list):
+        """
+        Concrete expected items are matched by digests, the rest (e.g.
+        CompareIgnore) by bipartite matching with augmenting paths, so a
+        placeholder never takes an item which a concrete item needs.
+        """
+        hasher = CanonicalHasher()
+        free = {}
+        candidates = []
+        for index, item in enumerate(other):
+            try:
+                free.setdefault(hasher.digest(item), []).append(index)
+            except TypeError:
+                candidates.append(index)
+        wildcards = []
+        for item in self.seq:
+            try:
+                digest = hasher.digest(item)
+            except TypeError:
+                wildcards.append(item)
+                continue
+            indexes = free.get(digest)
+            if not indexes:
+                return False
+            indexes.pop()
+        candidates.extend(x for indexes in free.values() for x in indexes)
+        edges = [[x for x in candidates if item == other[x]]
+                 for item in wildcards]
+        # Index of the actual item -> index of the wildcard matched to it
+        matched = {}
+
+        def augment(wildcard, seen):
+            for index in edges[wildcard]:
+                if index not in seen:
+                    seen.add(index)
+                    if index not in matched or augment(matched[index], seen):
+                        matched[index] = wildcard
+                        return True
+            return False
+
+        return all(augment(x, set()) for x in range(len(wildcards)))
+
 
 class CompareEndswith(CompareABC):
 
@@ -50,16 +110,21 @@ class CompareEndswith(CompareABC):
 
 
 class CompareDicts(CompareABC):
+    """
+    Compares canonical digests of values (equal digests mean equal
+    json.dumps(value, sort_keys=True)). Digest of the expected value is
+    computed once, so the value must not be modified after the first
+    comparison.
+    """
 
     def __init__(self, value):
         self.value = value
+        self._digest = None
 
     def __eq__(self, other: dict):
-        return self._to_str(self.value) == self._to_str(other)
+        if self._digest is None:
+            self._digest = CanonicalHasher().digest(self.value)
+        return self._digest == CanonicalHasher().digest(other)
 
     def __str__(self):
         return f'CompareDicts(value={self.value})'
-
-    @staticmethod
-    def _to_str(value: dict):
-        return json.dumps(value, sort_keys=True, indent='\t')
@@ -8,7 +8,11 @@ from requests import exceptions
 from requests import request as _request
 from urllib3.filepost import encode_multipart_formdata
 
-from model.helpers import AlternateJsonEncoder, Logger
+from model.helpers import (
+    AlternateJsonEncoder,
+    Logger,
+    TrafficLog
+)
 from model.http.message import MediaType
 from model.http.request import Request
 from model.http.response import Response
@@ -97,11 +101,12 @@ class ApiEndpoint:
         prepared_request: Request = self._build_request(*tests_args,
                                                         **tests_kwargs)
         response: Response = self.fire(prepared_request)
-        if Logger.log_request_reponse:
+        if Logger.log_request_reponse or TrafficLog.enabled:
             Logger.append_http(Request.parse(
                 response.original_response.request
             ), response,
-                comment=tests_kwargs.get("comment"))
+                comment=tests_kwargs.get("comment"),
+                template=self.path_url)
         return response
 
     def _build_request(self, *args, **kwargs) -> Request:
@@ -0,0 +1,170 @@
+from collections.abc import Mapping
+from typing import NamedTuple
+
+from .compare import (
+    CompareABC,
+    CompareIgnore
+)
+
+
+OP_DICT = 'dict'
+OP_LIST = 'list'
+OP_VALUE = 'value'
+OP_COMPARE = 'compare'
+
+_SKIP = object()
+
+
+class Mismatch(NamedTuple):
+    path: str
+    message: str
+
+    def __str__(self):
+        return f'{self.path}: {self.message}'
+
+
+class Instruction(NamedTuple):
+    op: str
+    # Index of the instruction which resolves the parent value (-1 - root)
+    parent: int
+    key: object
+    arg: object
+    path: str
+
+
+class Matcher(CompareABC):
+    """
+    Expected structure compiled into a flat program.
+
+    Expected data can mix plain values with CompareABC placeholders
+    (CompareIgnore, CompareEndswith, CompareIgnoreOrder, CompareDicts etc.).
+    The program is a list of instructions in pre-order, each of them
+    resolves its value from the value of its parent instruction, so the
+    actual data is checked in a single pass and all mismatches are
+    collected with their paths. Compile once and reuse:
+
+        EXPECTED = Matcher({'id': CompareIgnore(), 'items': [...]})
+        ...
+        assert response.check_body_diff_with(EXPECTED)
+    """
+
+    def __init__(self, expected):
+        self.expected = expected
+        self.program = self._compile(expected)
+
+    def __eq__(self, other):
+        return not self.match(other)
+
+    def __str__(self):
+        return f'Matcher(expected={self.expected})'
+
+    def match(self, actual) -> list:
+        """Returns list of mismatches, empty list means actual matches."""
+        mismatches = []
+        values = [_SKIP] * len(self.program)
+        for index, (op, parent, key, arg, path) in enumerate(self.program):
+            if parent < 0:
+                value = actual
+            else:
+                value = self._resolve(values[parent], key)
+                if value is _SKIP:
+                    continue
+
+            if op == OP_DICT:
+                if not isinstance(value, Mapping):
+                    mismatches.append(Mismatch(
+                        path, f'expected object, got {self._repr(value)}'))
+                    continue
+                # Keys are reported in the order of expected and actual data
+                keys, key_set = arg
+                for missing in keys:
+                    if missing not in value:
+                        mismatches.append(
+                            Mismatch(path, f'missing key {missing!r}'))
+                for unexpected in value.keys():
+                    if unexpected not in key_set:
+                        mismatches.append(Mismatch(
+                            path, f'unexpected key {unexpected!r}'))
+            elif op == OP_LIST:
+                if not isinstance(value, (list, tuple)):
+                    mismatches.append(Mismatch(
+                        path, f'expected array, got {self._repr(value)}'))
+                    continue
+                if len(value) != arg:
+                    mismatches.append(Mismatch(
+                        path, f'expected {arg} items, got {len(value)}'))
+            elif op == OP_VALUE:
+                if type(value) is not type(arg) or value != arg:
+                    mismatches.append(Mismatch(
+                        path, f'expected {self._repr(arg)}, '
+                              f'got {self._repr(value)}'))
+            elif op == OP_COMPARE:
+                try:
+                    matched = arg == value
+                except (AttributeError, TypeError, ValueError):
+                    matched = False
+                if not matched:
+                    mismatches.append(Mismatch(
+                        path, f'expected {arg}, got {self._repr(value)}'))
+            values[index] = value
+        return mismatches
+
+    def check(self, actual) -> bool:
+        mismatches = self.match(actual)
+        assert not mismatches, 'mismatches:\n' + '\n'.join(
+            str(x) for x in mismatches)
+        return True
+
+    @staticmethod
+    def _resolve(parent, key):
+        if parent is _SKIP:
+            return _SKIP
+        try:
+            return parent[key]
+        except (KeyError, IndexError, TypeError):
+            # Already reported by the parent instruction
+            return _SKIP
+
+    @staticmethod
+    def _repr(value) -> str:
+        return f'{value!r} ({type(value).__name__})'
+
+    @classmethod
+    def _compile(cls, expected) -> list:
+        program = []
+        stack = [(expected, -1, None, 'root')]
+        while stack:
+            value, parent, key, path = stack.pop()
+            index = len(program)
+            if isinstance(value, CompareIgnore):
+                continue
+            elif isinstance(value, Matcher):
+                # Inline the nested program
+                for op, child_parent, child_key, arg, child_path in \
+                        value.program:
+                    program.append(Instruction(
+                        op,
+                        parent if child_parent < 0 else child_parent + index,
+                        key if child_parent < 0 else child_key,
+                        arg,
+                        path + child_path[len('root'):]
+                    ))
+            elif isinstance(value, CompareABC):
+                program.append(
+                    Instruction(OP_COMPARE, parent, key, value, path))
+            elif isinstance(value, Mapping):
+                keys = tuple(value.keys())
+                program.append(Instruction(
+                    OP_DICT, parent, key, (keys, frozenset(keys)), path))
+                for child_key, child in reversed(list(value.items())):
+                    stack.append(
+                        (child, index, child_key, f'{path}[{child_key!r}]'))
+            elif isinstance(value, (list, tuple)):
+                program.append(
+                    Instruction(OP_LIST, parent, key, len(value), path))
+                for child_index in reversed(range(len(value))):
+                    stack.append((value[child_index], index, child_index,
+                                  f'{path}[{child_index}]'))
+            else:
+                program.append(Instruction(OP_VALUE, parent, key, value, path))
+        return program
@@ -34,6 +34,13 @@ class Message:
                                  cls=AlternateJsonEncoder)
         return result
 
+    def iter_raw_formatted_body(self):
+        """raw_formatted_body in chunks, so it can be cut without encoding
+        the whole body."""
+        if hasattr(self, 'body'):
+            encoder = AlternateJsonEncoder(indent=4, ensure_ascii=False)
+            yield from encoder.iterencode(self.body)
+
     @property
     def formatted_headers(self):
         result = ''
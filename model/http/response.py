@@ -17,12 +17,20 @@ from jsonschema.exceptions import (
 )
 from jsonschema.validators import urlopen
 
-from model.helpers import JsonHelper
+from model.helpers import (
+    JsonHelper,
+    Snapshot
+)
+from my_config import is_lazy_response_body
 from utils.altcollections import (
-    DictDiff,
-    RecursiveConverter
+    ExtDictView,
+    RecursiveConverter,
+    structures_equal,
+    unwrap
 )
 from utils.json_pretty_print import json_pretty_print
+from utils.jsondiff import JsonDiff
+from .matcher import Matcher
 from .message import (
     MediaType,
     Message
@@ -49,6 +57,10 @@ class ResponseStatusChecker:
 
 
 class Response(Message):
+    # Wrap parsed JSON bodies into ExtDictView instead of converting them.
+    # Views are read-only and arrays become ListView, which is not a list
+    lazy_body: bool = is_lazy_response_body
+
     def __init__(self, status, reason, body, headers, cookies=None,
                  original_response=None):
         self.status = status
@@ -63,17 +75,22 @@ class Response(Message):
             self.url = 'Unknown'
 
     def __str__(self):
-        return f'\n---------------------------------------' \
-               f'\nResponse:\n' \
-               f'HTTP status: {self.status} ' \
-               f'{self.reason}\n' \
-               f'{self.raw_formatted_headers}' \
-               f'\n{self.raw_formatted_body}'
+        return ''.join(self.iter_str())
+
+    def iter_str(self):
+        """str(response) in chunks, the body is encoded lazily."""
+        yield f'\n---------------------------------------' \
+              f'\nResponse:\n' \
+              f'HTTP status: {self.status} ' \
+              f'{self.reason}\n' \
+              f'{self.raw_formatted_headers}' \
+              f'\n'
+        yield from self.iter_raw_formatted_body()
 
     def conforms_to(self, schema_file_name, **kwargs):
         schema, schema_path = get_schema(schema_file_name)
         try:
-            validate_response(self.body, schema, schema_path)
+            validate_response(unwrap(self.body), schema, schema_path)
         except ValidationError as e:
             additional_info = ''
             if kwargs:
@@ -87,13 +104,39 @@ class Response(Message):
     def check_body_diff_with(self,
                              expected_response,
                              *args,
+                             ignore=None,
+                             ignore_order=None,
+                             tolerance=0,
                              **kwargs):
-        diff = DictDiff(expected_response, self.body)
+        """
+        usage: 'assert response.check_body_diff_with(
+            expected, ignore=['items[*].updated_at'],
+            ignore_order={'items': 'id'}, tolerance=0.01)'
+        'expected_response' can be a compiled Matcher as well.
+        """
+        body = unwrap(self.body)
+        if isinstance(expected_response, Matcher):
+            return expected_response.check(body)
+
+        # Identical bodies are the common case: skip the diff engine for them
+        if structures_equal(expected_response, body):
+            return True
+
+        diff = JsonDiff(expected_response, body, ignore=ignore,
+                        ignore_order=ignore_order, tolerance=tolerance)
 
         assert diff.to_dict() == {}, f"diff={json_pretty_print(diff.to_json())}"
 
         return True
 
+    def matches_snapshot(self, name, ignore=None):
+        """
+        usage: 'assert response.matches_snapshot('name', ignore=['**.id'])'
+        Body is recorded on the first run or with --snapshot-update.
+        """
+        return Snapshot.get_current().assert_match(unwrap(self.body), name,
+                                                   ignore=ignore)
+
     @property
     def status_is(self) -> HTTPStatus:
         """usage: 'assert response.status_is.OK'"""
@@ -131,14 +174,16 @@ class Response(Message):
             original_response=_response
         )
 
-    @staticmethod
-    def _parse_body(request):
+    @classmethod
+    def _parse_body(cls, request):
         try:
             res = request.json()
         except JSONDecodeError:
             return request.text
         else:
             if isinstance(res, (dict, list)):
+                if cls.lazy_body:
+                    return ExtDictView.wrap(res)
                 return RecursiveConverter(res)
             return res
 
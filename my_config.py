@@ -9,8 +9,28 @@ local_env_dbpassword: str = getenv("QA_AUTOTESTS_DB_P", "")
 is_needed_request_logs: bool = getenv("QA_AUTOTESTS_REQUEST_LOGS",
                                       "yes") == "yes"
 is_needed_sql_logs: bool = getenv("QA_AUTOTESTS_SQL_LOGS", "yes") == "yes"
+# Limits of the per-test log (Logger): older items are spilled to a temp
+# file, items beyond the spill budget are dropped and counted
+log_max_items: int = int(getenv("QA_AUTOTESTS_LOG_MAX_ITEMS", "200"))
+log_max_bytes: int = int(getenv("QA_AUTOTESTS_LOG_MAX_BYTES",
+                                str(32 * 1024 * 1024)))
+log_max_spill_bytes: int = int(getenv("QA_AUTOTESTS_LOG_MAX_SPILL_BYTES",
+                                      str(512 * 1024 * 1024)))
+# Limits of rendered log blocks in the HTML report, the full data is saved
+# next to the report and linked
+html_max_text_size: int = int(getenv("QA_AUTOTESTS_HTML_MAX_TEXT",
+                                     "200000"))
+html_max_rows: int = int(getenv("QA_AUTOTESTS_HTML_MAX_ROWS", "200"))
+# Response.body as a zero-copy ExtDictView instead of converted ExtDict.
+# 'config' below stays ExtDict: it is small, converted once on import and
+# its lookups do not copy anything, while tests may modify it
+is_lazy_response_body: bool = getenv("QA_AUTOTESTS_LAZY_BODY", "no") == "yes"
 
 proxy: Optional[str] = getenv("QA_AUTOTESTS_PROXY_FOR_DEBUG")
+# Local Postgres for tests of the framework (tests/framework), e.g.
+# "dbname=postgres user=postgres host=localhost", the tests are skipped
+# without it
+local_pg_dsn: Optional[str] = getenv("QA_AUTOTESTS_LOCAL_PG_DSN")
 
 config: ExtDict = ExtDict({
     "db": {
@@ -1,6 +1,7 @@
 import pytest
 
 from utils.db import (
+    PooledPostgres,
     Postgres,
     PostgresConnectionManager
 )
@@ -12,3 +13,26 @@ def db_example(env: str, global_config, request) -> Postgres:
         global_config.db.example_pg[env],
         request
     ).get_connection())
+
+
+@pytest.fixture(scope='session')
+def db_example_pool(env: str, global_config, request) -> PooledPostgres:
+    """The same database for concurrent usage (threads, asyncio tasks)."""
+    return PooledPostgres(PostgresConnectionManager(
+        global_config.db.example_pg[env],
+        request
+    ).get_pool(max_size=5))
+
+
+@pytest.fixture
+def db_example_isolated(db_example, request) -> Postgres:
+    """
+    db_example with changes of the test rolled back after it, instead of
+    DELETE cleanup. Tests marked 'db_commit' (e.g. the data must be seen by
+    the services under test) commit as usual and clean up themselves.
+    """
+    if request.node.get_closest_marker('db_commit'):
+        yield db_example
+        return
+    with db_example.isolated():
+        yield db_example
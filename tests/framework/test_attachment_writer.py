@@ -0,0 +1,68 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from model.helpers import attachment_writer
+from model.helpers.attachment_writer import AttachmentWriter
+
+
+class FakePluginManager:
+    def __init__(self, listener=None):
+        self.listener = listener
+
+    def get_plugin(self, name):
+        return self.listener
+
+
+@pytest.fixture
+def attached(monkeypatch):
+    result = []
+    monkeypatch.setattr(attachment_writer.allure, 'attach',
+                        lambda body, **kwargs: result.append(body))
+    yield result
+    AttachmentWriter.stop()
+    AttachmentWriter.enabled = False
+    AttachmentWriter._pluginmanager = None
+
+
+@pytest.mark.parametrize('enabled, listener', [
+    (False, SimpleNamespace(allure_logger=SimpleNamespace(_attach=None))),
+    (True, None),
+    (True, SimpleNamespace()),
+    (True, SimpleNamespace(allure_logger=SimpleNamespace()))
+], ids=['sync', 'no listener', 'no logger', 'no _attach'])
+def test_falls_back_to_allure_attach(attached, enabled, listener):
+    AttachmentWriter.configure(
+        SimpleNamespace(pluginmanager=FakePluginManager(listener)), enabled)
+    AttachmentWriter.attach(lambda: 'body', 'name', 'text/plain')
+    assert attached == ['body']
+    assert AttachmentWriter._thread is None
+
+
+def test_writer_is_started_once(monkeypatch, attached):
+    started = []
+    monkeypatch.setattr(AttachmentWriter, '_run',
+                        classmethod(lambda cls, queue: started.append(queue)))
+    barrier = threading.Barrier(8)
+
+    def start():
+        barrier.wait()
+        AttachmentWriter._start()
+
+    threads = [threading.Thread(target=start) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    AttachmentWriter._thread.join()
+    AttachmentWriter._thread = None
+    AttachmentWriter._queue = None
+    assert len(started) == 1
+
+
+def test_configure_resets_errors(attached):
+    AttachmentWriter._errors.append(ValueError('previous session'))
+    AttachmentWriter.configure(
+        SimpleNamespace(pluginmanager=FakePluginManager()), False)
+    assert AttachmentWriter._errors == []
@@ -0,0 +1,94 @@
+from uuid import uuid4
+
+import psycopg2
+import pytest
+
+from my_config import local_pg_dsn
+from utils.db import (
+    Postgres,
+    SQLDB
+)
+
+
+@pytest.fixture
+def pg_dsn() -> str:
+    if not local_pg_dsn:
+        pytest.skip('QA_AUTOTESTS_LOCAL_PG_DSN is not set')
+    try:
+        psycopg2.connect(local_pg_dsn).close()
+    except psycopg2.OperationalError as e:
+        pytest.skip(f'Local Postgres is not available: {e}')
+    return local_pg_dsn
+
+
+@pytest.fixture
+def observer(pg_dsn):
+    connection = psycopg2.connect(pg_dsn)
+    connection.autocommit = True
+    yield connection
+    connection.close()
+
+
+@pytest.fixture
+def table(observer) -> str:
+    name = f'qa_bulk_{uuid4().hex[:8]}'
+    with observer.cursor() as cursor:
+        cursor.execute(f'CREATE TABLE {name} (id int PRIMARY KEY, name text)')
+    yield name
+    with observer.cursor() as cursor:
+        cursor.execute(f'DROP TABLE {name}')
+
+
+@pytest.fixture(params=[False, True], ids=['transaction', 'autocommit'])
+def db(pg_dsn, request) -> Postgres:
+    connection = psycopg2.connect(pg_dsn)
+    connection.autocommit = request.param
+    yield Postgres(connection)
+    assert connection.autocommit == request.param
+    connection.close()
+
+
+def count_rows(observer, table) -> int:
+    with observer.cursor() as cursor:
+        cursor.execute(f'SELECT count(*) FROM {table}')
+        return cursor.fetchone()[0]
+
+
+def test_sqldb_requires_only_basic_methods():
+    class Minimal(SQLDB):
+        def select_one(self, query, params=None):
+            pass
+
+        def select_all(self, query, params=None):
+            pass
+
+        def execute(self, query, params=None):
+            pass
+
+    Minimal()
+
+
+@pytest.mark.parametrize('method, size', [
+    ('copy_rows', 'batch_size'),
+    ('insert_rows', 'page_size')
+])
+def test_rows_are_loaded(db, observer, table, method, size):
+    rows = ({'id': i, 'name': f'name\t{i}'} for i in range(25))
+    assert getattr(db, method)(table, rows, **{size: 10}) == 25
+    assert count_rows(observer, table) == 25
+    assert db.select_one(f'SELECT name FROM {table} WHERE id = 3').name \
+        == 'name\t3'
+
+
+@pytest.mark.parametrize('method, size', [
+    ('copy_rows', 'batch_size'),
+    ('insert_rows', 'page_size')
+])
+def test_failed_batch_rolls_back_all_batches(db, observer, table, method,
+                                             size):
+    # The duplicate is in the third batch
+    rows = [(i, None) for i in range(25)] + [(0, None)]
+    with pytest.raises(psycopg2.errors.UniqueViolation):
+        getattr(db, method)(table, rows, columns=['id', 'name'],
+                            **{size: 10})
+    assert count_rows(observer, table) == 0
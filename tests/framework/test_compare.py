@@ -0,0 +1,37 @@
+import pytest
+
+from model.http.compare import (
+    CompareEndswith,
+    CompareIgnore,
+    CompareIgnoreOrder
+)
+
+
+@pytest.mark.parametrize('expected, actual', [
+    ([1, 2, 3], [3, 1, 2]),
+    ([{'a': 1}, [1, 2]], [[1, 2], {'a': 1}]),
+    ([CompareIgnore(), 1], [1, 2]),
+    ([CompareIgnore(), 1], [2, 1]),
+    ([CompareEndswith('b'), 'ab'], ['ab', 'cb']),
+    ([CompareEndswith('b'), CompareEndswith('ab')], ['ab', 'cb']),
+    ([{'id': CompareIgnore()}, {'id': 1}], [{'id': 1}, {'id': 2}])
+])
+def test_equal_regardless_of_order(expected, actual):
+    assert CompareIgnoreOrder(expected) == actual
+
+
+@pytest.mark.parametrize('expected, actual', [
+    ([1, 2], [1, 1]),
+    ([1, 2], [1, 2, 3]),
+    ([CompareIgnore(), 1], [2, 3]),
+    ([CompareEndswith('b'), CompareEndswith('b')], ['ab', 'ac']),
+    ([1], {'a': 1})
+])
+def test_not_equal(expected, actual):
+    assert CompareIgnoreOrder(expected) != actual
+
+
+def test_key_sorts_both_sequences():
+    assert CompareIgnoreOrder([{'id': 2}, {'id': 1}],
+                              key=lambda x: x['id']) == [{'id': 1},
+                                                         {'id': 2}]
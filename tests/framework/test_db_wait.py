@@ -0,0 +1,137 @@
+import asyncio
+import threading
+import time
+from uuid import uuid4
+
+import psycopg2
+import pytest
+
+from my_config import local_pg_dsn
+from utils.db import Postgres
+from utils.wait import (
+    for_db_state,
+    for_db_state_async
+)
+
+
+@pytest.fixture
+def pg_dsn() -> str:
+    if not local_pg_dsn:
+        pytest.skip('QA_AUTOTESTS_LOCAL_PG_DSN is not set')
+    try:
+        psycopg2.connect(local_pg_dsn).close()
+    except psycopg2.OperationalError as e:
+        pytest.skip(f'Local Postgres is not available: {e}')
+    return local_pg_dsn
+
+
+@pytest.fixture
+def table(pg_dsn) -> str:
+    name = f'qa_wait_{uuid4().hex[:8]}'
+    connection = psycopg2.connect(pg_dsn)
+    connection.autocommit = True
+    with connection.cursor() as cursor:
+        cursor.execute(f'CREATE TABLE {name} (id int, done bool)')
+        cursor.execute(f'INSERT INTO {name} VALUES (1, false)')
+    yield name
+    with connection.cursor() as cursor:
+        cursor.execute(f'DROP TABLE {name}')
+    connection.close()
+
+
+@pytest.fixture
+def db(pg_dsn) -> Postgres:
+    connection = psycopg2.connect(pg_dsn)
+    yield Postgres(connection)
+    connection.close()
+
+
+def finish_later(dsn: str, table: str, delay: float, notify: bool = False):
+    """Marks the row as done from another connection after 'delay'."""
+
+    def finish():
+        time.sleep(delay)
+        connection = psycopg2.connect(dsn)
+        connection.autocommit = True
+        with connection.cursor() as cursor:
+            cursor.execute(f'UPDATE {table} SET done = true')
+            if notify:
+                cursor.execute(f'NOTIFY {table}')
+        connection.close()
+
+    thread = threading.Thread(target=finish)
+    thread.start()
+    return thread
+
+
+def test_for_db_state_polls_until_success(db, pg_dsn, table):
+    thread = finish_later(pg_dsn, table, 0.3)
+    started = time.monotonic()
+    result = for_db_state(db, f'SELECT * FROM {table} WHERE id = %s',
+                          lambda x: x.done, timeout=5, params=(1,))
+    thread.join()
+
+    assert result.done
+    assert time.monotonic() - started < 2
+
+
+def test_for_db_state_wakes_up_on_notification(db, pg_dsn, table):
+    thread = finish_later(pg_dsn, table, 0.3, notify=True)
+    started = time.monotonic()
+    # Without the notification the second check would be in 5 s
+    result = for_db_state(db, f'SELECT * FROM {table}', lambda x: x.done,
+                          timeout=10, channel=table, interval=5)
+    thread.join()
+
+    assert result.done
+    assert time.monotonic() - started < 3
+
+
+def test_for_db_state_async(db, pg_dsn, table):
+    thread = finish_later(pg_dsn, table, 0.3, notify=True)
+    result = asyncio.run(for_db_state_async(
+        db, f'SELECT * FROM {table}', lambda x: x.done, timeout=10,
+        channel=table, interval=5))
+    thread.join()
+
+    assert result.done
+
+
+def test_for_db_state_fails_at_deadline(db, table):
+    started = time.monotonic()
+    with pytest.raises(pytest.fail.Exception, match='timeout exceeded'):
+        for_db_state(db, f'SELECT * FROM {table}', lambda x: x.done,
+                     timeout=0.5)
+
+    assert time.monotonic() - started < 1.5
+
+
+def test_for_db_state_fails_without_rows(db, table):
+    with pytest.raises(pytest.fail.Exception, match='no entry found'):
+        for_db_state(db, f'SELECT * FROM {table} WHERE id = 2',
+                     lambda x: x.done)
+
+
+def test_notifications_are_disabled_in_isolated_block(db, table):
+    with db.isolated(), db.listen(table) as wait:
+        db.execute(f'NOTIFY {table}')
+        assert not wait(0.1)
+
+
+class QueryOnlyDB:
+    """Legacy db class whose select_one() takes the query only."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def select_one(self, query):
+        self.calls += 1
+        return {'done': self.calls == 2}
+
+
+def test_params_are_passed_only_if_given():
+    db = QueryOnlyDB()
+    assert for_db_state(db, 'SELECT 1', lambda x: x['done'], timeout=5)
+    db = QueryOnlyDB()
+    assert asyncio.run(for_db_state_async(db, 'SELECT 1',
+                                          lambda x: x['done'], timeout=5))
@@ -0,0 +1,99 @@
+import pytest
+
+from utils.altcollections import (
+    DictDiff,
+    ExtDict,
+    TupleDict
+)
+from utils.jsondiff import (
+    JsonDiff,
+    PathPatterns
+)
+
+
+EXPECTED = {
+    'id': 1,
+    'name': 'order',
+    'price': 10.5,
+    'meta': {'created': '2020-01-01', 'tags': ['a', 'b']},
+    'items': [{'id': 1, 'count': 2}, {'id': 2, 'count': 3}]
+}
+
+
+@pytest.mark.parametrize('actual', [
+    EXPECTED,
+    {**EXPECTED, 'name': 'changed'},
+    {**EXPECTED, 'price': '10.5'},
+    {**EXPECTED, 'extra': True},
+    {key: value for key, value in EXPECTED.items() if key != 'meta'},
+    {**EXPECTED, 'meta': {'created': '2020-01-01', 'tags': ['a']}},
+    {**EXPECTED, 'meta': {'created': '2020-01-01', 'tags': ['a', 'b', 'c']}},
+    {**EXPECTED, 'items': [{'id': 1, 'count': 5}, {'id': 2, 'count': 3}]},
+    {**EXPECTED, 'items': None}
+], ids=['equal', 'value', 'type', 'added', 'removed', 'item_removed',
+        'item_added', 'nested_value', 'list_to_none'])
+@pytest.mark.parametrize('wrap', [dict, ExtDict], ids=['dict', 'ExtDict'])
+def test_report_is_the_same_as_dict_diff(actual, wrap):
+    expected = wrap(EXPECTED)
+
+    assert JsonDiff(expected, actual).to_dict() == \
+        DictDiff(expected, actual).to_dict()
+
+
+def test_custom_dictionaries_are_compared_as_dict():
+    assert not JsonDiff(TupleDict(EXPECTED), ExtDict(EXPECTED))
+
+
+@pytest.mark.parametrize('ignore', [
+    ['meta.created', 'items[*].count'],
+    ['**.count', 'meta.*'],
+    ['meta', 'items[0].count', 'items[1]']
+])
+def test_ignored_paths_are_not_reported(ignore):
+    actual = {
+        **EXPECTED,
+        'meta': {'created': '2021-01-01', 'tags': ['a', 'b']},
+        'items': [{'id': 1, 'count': 5}, {'id': 2, 'count': 6}]
+    }
+
+    assert not JsonDiff(EXPECTED, actual, ignore=ignore)
+
+
+def test_not_ignored_paths_are_reported():
+    actual = {**EXPECTED, 'id': 2, 'meta': {'created': '2021-01-01',
+                                            'tags': ['a', 'b']}}
+
+    diff = JsonDiff(EXPECTED, actual, ignore=['meta.created'])
+
+    assert diff == {'values_changed': {
+        "root['id']": {'new_value': 2, 'old_value': 1}}}
+
+
+def test_ignore_order_matches_items_by_key():
+    actual = {**EXPECTED, 'items': [{'id': 2, 'count': 3},
+                                    {'id': 1, 'count': 4}]}
+
+    diff = JsonDiff(EXPECTED, actual, ignore_order={'items': 'id'})
+
+    assert diff == {'values_changed': {
+        "root['items'][0]['count']": {'new_value': 4, 'old_value': 2}}}
+
+
+def test_tolerance_of_numbers():
+    assert not JsonDiff({'price': 10}, {'price': 10.004}, tolerance=0.01)
+    assert JsonDiff({'price': 10}, {'price': 10.1}, tolerance=0.01)
+
+
+def test_path_patterns_caches_are_separate():
+    patterns = PathPatterns(['a.b'])
+    states = patterns.step(patterns.initial, 'a', False)
+
+    assert patterns.matched(states) == ()
+    assert patterns.step(states, 'b', False) != ()
+    assert patterns.matched(patterns.step(states, 'b', False)) == (0,)
+    assert patterns.matched(patterns.initial) == ()
+
+
+def test_invalid_pattern():
+    with pytest.raises(ValueError):
+        PathPatterns(['a..b'])
@@ -0,0 +1,69 @@
+import pytest
+
+from model.helpers.log_helper import LogHelper
+from model.helpers.logger import ResponseRecord
+
+
+class FakeRequest:
+    method = 'GET'
+    url = 'http://localhost/'
+    path_url = '/'
+    query_string = ''
+    formatted_headers = ''
+    formatted_body = ''
+
+    def __str__(self):
+        return 'GET http://localhost/'
+
+
+class FakeOriginal:
+    elapsed = 0.1
+    content = b'{"id": 1}'
+
+
+class FakeResponse:
+    status = 200
+    reason = 'OK'
+    url = 'http://localhost/'
+    headers = {'Content-Type': 'application/json'}
+    original_response = FakeOriginal()
+    builds = 0
+
+    @classmethod
+    def build(cls, original):
+        cls.builds += 1
+        return BuiltResponse()
+
+
+class BuiltResponse:
+    def iter_str(self):
+        yield '200 OK\n'
+        yield '{"id": 1}'
+
+    def __str__(self):
+        return ''.join(self.iter_str())
+
+
+@pytest.fixture
+def current_call():
+    LogHelper.set('service', FakeRequest(), FakeResponse())
+    yield LogHelper.current()
+    LogHelper.clear()
+
+
+def test_response_record_is_built_once():
+    FakeResponse.builds = 0
+    record = ResponseRecord(FakeResponse())
+    assert ''.join(record.iter_str()) == '200 OK\n{"id": 1}'
+    assert str(record) == '200 OK\n{"id": 1}'
+    assert ''.join(record.iter_str()) == str(record)
+    assert FakeResponse.builds == 1
+
+
+def test_deprecated_current_attributes(current_call):
+    with pytest.deprecated_call():
+        assert LogHelper.current_service == 'service'
+    with pytest.deprecated_call():
+        assert LogHelper.current_response is current_call.response
+    with pytest.deprecated_call():
+        assert LogHelper.current_request is current_call.request
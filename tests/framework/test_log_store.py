@@ -0,0 +1,100 @@
+import threading
+
+from model.helpers.logger import (
+    LogItem,
+    LogStore
+)
+
+
+def text(data: str) -> LogItem:
+    return LogItem('text', data)
+
+
+def data_of(store: LogStore) -> list:
+    return [item.data for item in store]
+
+
+def test_items_are_kept_in_memory_within_limits():
+    store = LogStore(max_items=3, max_bytes=100, max_spill_bytes=1000)
+    for i in range(3):
+        store.append(text(f'item {i}'))
+    assert data_of(store) == ['item 0', 'item 1', 'item 2']
+    assert store.spilled == 0
+    assert store._spill_file is None
+
+
+def test_older_items_are_spilled_by_count():
+    store = LogStore(max_items=2, max_bytes=1000, max_spill_bytes=10000)
+    for i in range(5):
+        store.append(text(f'item {i}'))
+    assert store.spilled == 3
+    assert len(store._items) == 2
+    assert len(store) == 5
+    assert data_of(store) == [f'item {i}' for i in range(5)]
+    # Reading does not lose the position of the spill file
+    store.append(text('item 5'))
+    assert data_of(store) == [f'item {i}' for i in range(6)]
+
+
+def test_older_items_are_spilled_by_size():
+    store = LogStore(max_items=100, max_bytes=25, max_spill_bytes=10000)
+    for i in range(4):
+        store.append(text(f'{i}' * 10))
+    assert store.spilled == 2
+    assert data_of(store) == [f'{i}' * 10 for i in range(4)]
+
+
+def test_last_item_is_kept_even_if_it_exceeds_the_budget():
+    store = LogStore(max_items=10, max_bytes=5, max_spill_bytes=10000)
+    store.append(text('x' * 100))
+    assert len(store._items) == 1
+    assert store.spilled == 0
+
+
+def test_items_beyond_spill_budget_are_dropped():
+    store = LogStore(max_items=1, max_bytes=1000, max_spill_bytes=0)
+    for i in range(4):
+        store.append(text(f'item {i}'))
+    assert store.spilled == 0
+    assert store.dropped == 3
+    assert store.dropped_bytes == 3 * len('item 0')
+    items = list(store)
+    assert [item.data for item in items[:-1]] == ['item 3']
+    assert 'Log limit exceeded: 3 items' in items[-1].data
+
+
+def test_items_which_can_not_be_pickled_are_dropped():
+    store = LogStore(max_items=1, max_bytes=1000, max_spill_bytes=10000)
+    store.append(LogItem('text', threading.Lock()))
+    store.append(text('item'))
+    assert store.spilled == 0
+    assert store.dropped == 1
+
+
+def test_clear():
+    store = LogStore(max_items=1, max_bytes=1000, max_spill_bytes=20)
+    for i in range(5):
+        store.append(text(f'item {i}'))
+    assert store.spilled and store.dropped
+    store.clear()
+    assert not store
+    assert list(store) == []
+    assert store._spill_file is None
+    assert (store.spilled, store.dropped) == (0, 0)
+
+
+def test_concurrent_append():
+    store = LogStore(max_items=5, max_bytes=10000, max_spill_bytes=10 ** 6)
+
+    def append(thread):
+        for i in range(100):
+            store.append(text(f'{thread}-{i}'))
+
+    threads = [threading.Thread(target=append, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(store) == 400
+    assert sorted(data_of(store)) == sorted(
+        f'{n}-{i}' for n in range(4) for i in range(100))
@@ -0,0 +1,55 @@
+import threading
+
+import pytest
+
+from model.helpers.logger import (
+    LogStore,
+    Logger
+)
+
+
+@pytest.fixture
+def test_log():
+    token = Logger.start_test('test_a')
+    yield Logger.items
+    Logger.finish_test(token)
+
+
+def data_of(items) -> list:
+    return [item.data for item in items]
+
+
+def run_thread(target):
+    thread = threading.Thread(target=target)
+    thread.start()
+    thread.join()
+
+
+def test_items_attribute(test_log):
+    Logger.append_text('a')
+    assert isinstance(Logger.items, LogStore)
+    assert Logger.items is test_log
+    assert data_of(Logger.items) == ['a']
+    assert len(Logger.items) == 1
+
+
+def test_items_outside_of_tests():
+    assert Logger.items is Logger.default_items
+
+
+def test_wrapped_thread_logs_to_the_test(test_log):
+    run_thread(Logger.wrap(lambda: Logger.append_text('thread')))
+    assert data_of(test_log) == ['thread']
+    assert not Logger.default_items
+
+
+def test_items_of_unwrapped_threads_are_rendered(test_log):
+    Logger.append_text('test')
+    run_thread(lambda: Logger.append_text('thread'))
+    rendered = data_of(Logger.rendered_items())
+    assert rendered[0] == 'test'
+    assert 'Logger.wrap()' in rendered[1]
+    assert rendered[2:] == ['thread']
+    Logger.clear()
+    assert not Logger.items
+    assert not Logger.default_items
@@ -0,0 +1,82 @@
+import pytest
+
+from model.http.compare import (
+    CompareEndswith,
+    CompareIgnore,
+    CompareIgnoreOrder
+)
+from model.http.matcher import Matcher
+from utils.altcollections import ExtDict
+
+
+EXPECTED = {
+    'id': CompareIgnore(),
+    'name': 'order',
+    'url': CompareEndswith('/1'),
+    'tags': CompareIgnoreOrder(['a', 'b']),
+    'items': [{'id': 1, 'price': 10.5}]
+}
+ACTUAL = {
+    'id': 123,
+    'name': 'order',
+    'url': 'https://example.com/orders/1',
+    'tags': ['b', 'a'],
+    'items': [{'id': 1, 'price': 10.5}]
+}
+
+
+def test_matching_data():
+    matcher = Matcher(EXPECTED)
+
+    assert matcher.match(ACTUAL) == []
+    assert matcher.match(ExtDict(ACTUAL)) == []
+    assert matcher == ACTUAL
+
+
+def test_mismatches_have_paths():
+    actual = {**ACTUAL, 'name': 'other', 'items': [{'id': '1',
+                                                    'price': 10.5}]}
+
+    assert [str(x) for x in Matcher(EXPECTED).match(actual)] == [
+        "root['name']: expected 'order' (str), got 'other' (str)",
+        "root['items'][0]['id']: expected 1 (int), got '1' (str)"]
+
+
+def test_missing_and_unexpected_keys_are_ordered():
+    matcher = Matcher({'a': 1, 'b': 2, 'c': 3, 'd': 4})
+
+    mismatches = matcher.match({'d': 4, 'z': 0, 'b': 2, 'y': 0})
+
+    assert [str(x) for x in mismatches] == [
+        "root: missing key 'a'",
+        "root: missing key 'c'",
+        "root: unexpected key 'z'",
+        "root: unexpected key 'y'"]
+
+
+@pytest.mark.parametrize('actual, message', [
+    ([], 'root: expected object, got [] (list)'),
+    ({**ACTUAL, 'items': {}}, "root['items']: expected array, got {} (dict)"),
+    ({**ACTUAL, 'items': []}, "root['items']: expected 1 items, got 0"),
+    ({**ACTUAL, 'url': None},
+     "root['url']: expected CompareEndswith(postfix=/1), got None "
+     "(NoneType)")
+])
+def test_structure_mismatches(actual, message):
+    assert [str(x) for x in Matcher(EXPECTED).match(actual)] == [message]
+
+
+def test_nested_matcher_is_inlined():
+    item = Matcher({'id': 1, 'price': CompareIgnore()})
+    matcher = Matcher({'items': [item, item]})
+
+    mismatches = matcher.match({'items': [{'id': 1, 'price': 1},
+                                          {'id': 2, 'price': 2}]})
+
+    assert [str(x) for x in mismatches] == [
+        "root['items'][1]['id']: expected 1 (int), got 2 (int)"]
+
+
+def test_check_raises_with_all_mismatches():
+    with pytest.raises(AssertionError, match="root\\['name'\\]"):
+        Matcher(EXPECTED).check({**ACTUAL, 'name': 'other'})
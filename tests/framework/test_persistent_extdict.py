@@ -0,0 +1,83 @@
+import pytest
+
+from utils.altcollections import PersistentExtDict
+
+
+@pytest.fixture
+def base() -> PersistentExtDict:
+    return PersistentExtDict({
+        'a': {'b': {'c': 1}},
+        'items': [{'id': 1}, {'id': 2}],
+        'name': 'base'
+    })
+
+
+def mutate_nested(data):
+    data['a']['b']['c'] = 99
+
+
+@pytest.mark.parametrize('take', [
+    lambda x: x,
+    lambda x: dict(x),
+    lambda x: {**x},
+    lambda x: dict(x.items()),
+    lambda x: {'a': x.get('a')},
+    lambda x: {'a': x.a},
+    lambda x: {'a': list(x.values())[0]},
+    lambda x: {'a': x.pop('a')},
+    lambda x: {'a': x.setdefault('a')},
+    lambda x: x.to_dict()
+], ids=['getitem', 'dict', 'unpacking', 'items', 'get', 'attribute',
+        'values', 'pop', 'setdefault', 'to_dict'])
+def test_copy_is_isolated_from_source_and_siblings(base, take):
+    variant = base.copy()
+    sibling = base.copy()
+
+    mutate_nested(take(variant))
+
+    assert base.a.b.c == 1
+    assert sibling.a.b.c == 1
+
+
+def test_popitem_owns_the_value():
+    base = PersistentExtDict({'name': 'base', 'a': {'b': {'c': 1}}})
+    variant = base.copy()
+
+    key, value = variant.popitem()
+    value['b']['c'] = 99
+
+    assert key == 'a'
+    assert base.a.b.c == 1
+
+
+def test_source_is_isolated_from_copy(base):
+    variant = base.copy()
+
+    mutate_nested(base)
+    base['items'][0]['id'] = 10
+
+    assert variant.a.b.c == 1
+    assert variant['items'][0]['id'] == 1
+
+
+def test_derived_copies_share_unchanged_subtrees(base):
+    variant = base.replace('name', 'variant')
+
+    assert dict.__getitem__(variant, 'a') is dict.__getitem__(base, 'a')
+    assert variant.name == 'variant'
+    assert base.name == 'base'
+
+
+@pytest.mark.parametrize('derive', [
+    lambda x: x.crop('name'),
+    lambda x: x.add(extra=1),
+    lambda x: x.replace('name', 'variant')
+], ids=['crop', 'add', 'replace'])
+def test_derived_copy_is_isolated(base, derive):
+    variant = derive(base)
+
+    mutate_nested(variant)
+    variant['items'].append({'id': 3})
+
+    assert base.a.b.c == 1
+    assert len(base['items']) == 2
@@ -0,0 +1,104 @@
+import asyncio
+import select
+from uuid import uuid4
+
+import psycopg2
+import pytest
+
+from my_config import local_pg_dsn
+from utils.db import (
+    ConnectionPool,
+    PooledPostgres
+)
+
+
+@pytest.fixture
+def pg_dsn() -> str:
+    if not local_pg_dsn:
+        pytest.skip('QA_AUTOTESTS_LOCAL_PG_DSN is not set')
+    try:
+        psycopg2.connect(local_pg_dsn).close()
+    except psycopg2.OperationalError as e:
+        pytest.skip(f'Local Postgres is not available: {e}')
+    return local_pg_dsn
+
+
+@pytest.fixture
+def observer(pg_dsn):
+    """Connection of 'another service', it sees only committed data."""
+    connection = psycopg2.connect(pg_dsn)
+    connection.autocommit = True
+    yield connection
+    connection.close()
+
+
+@pytest.fixture
+def db(pg_dsn) -> PooledPostgres:
+    pool = ConnectionPool(lambda: psycopg2.connect(pg_dsn), max_size=3)
+    yield PooledPostgres(pool)
+    pool.close()
+
+
+@pytest.fixture
+def table(db, observer) -> str:
+    name = f'qa_pool_{uuid4().hex[:8]}'
+    yield name
+    with observer.cursor() as cursor:
+        cursor.execute(f'DROP TABLE IF EXISTS {name}')
+
+
+def count_rows(observer, table) -> int:
+    with observer.cursor() as cursor:
+        cursor.execute(f'SELECT count(*) FROM {table}')
+        return cursor.fetchone()[0]
+
+
+def test_statements_without_rows_are_committed(db, observer, table):
+    db.execute(f'CREATE TABLE {table} (id int)')
+    db.execute(f'TRUNCATE {table}')
+    assert count_rows(observer, table) == 0
+
+    with observer.cursor() as cursor:
+        cursor.execute(f'LISTEN {table}')
+    db.execute(f'NOTIFY {table}')
+    select.select([observer], [], [], 5)
+    observer.poll()
+    assert [x.channel for x in observer.notifies] == [table]
+
+
+def test_isolated_block_covers_tasks(db, observer, table):
+    db.execute(f'CREATE TABLE {table} (id int)')
+
+    async def insert(value):
+        db.execute(f'INSERT INTO {table} VALUES ({value})')
+        return db.select_one(f'SELECT count(*) AS count FROM {table}').count
+
+    async def insert_all():
+        return await asyncio.gather(insert(1), insert(2))
+
+    with db.isolated():
+        counts = asyncio.run(insert_all())
+        assert sorted(counts) == [1, 2]
+        assert count_rows(observer, table) == 0
+    assert count_rows(observer, table) == 0
+    assert db.select_one(f'SELECT count(*) AS count FROM {table}').count == 0
+
+
+def test_tasks_outliving_the_block_use_own_connection(db, table):
+    db.execute(f'CREATE TABLE {table} (id int)')
+
+    async def main():
+        with db.isolated():
+            started = asyncio.Event()
+
+            async def late_insert():
+                started.set()
+                await asyncio.sleep(0.05)
+                db.execute(f'INSERT INTO {table} VALUES (1)')
+
+            task = asyncio.create_task(late_insert())
+            await started.wait()
+        await task
+
+    asyncio.run(main())
+    assert db.select_one(f'SELECT count(*) AS count FROM {table}').count == 1
@@ -0,0 +1,139 @@
+import psycopg2
+import pytest
+
+from utils.db import (
+    Postgres,
+    PreparedStatements
+)
+
+
+class FakeCursor:
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.rowcount = 1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def execute(self, query, params=None):
+        self.connection.log.append((query, params))
+        if query.startswith('PREPARE') and 'unknown' in query:
+            raise psycopg2.ProgrammingError('could not determine data type')
+
+    def fetchone(self):
+        return {'id': 1}
+
+    def fetchall(self):
+        return [{'id': 1}]
+
+
+class FakeConnection:
+    autocommit = False
+
+    def __init__(self):
+        self.log = []
+
+    def cursor(self, **kwargs):
+        return FakeCursor(self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def statements(self, prefix):
+        return [x for x in self.log if x[0].startswith(prefix)]
+
+
+@pytest.fixture
+def connection() -> FakeConnection:
+    return FakeConnection()
+
+
+@pytest.fixture
+def db(connection) -> Postgres:
+    result = Postgres(connection)
+    result.statement_cache_size = 2
+    return result
+
+
+def test_cache_is_disabled_by_default(connection):
+    db = Postgres(connection)
+    for _ in range(3):
+        db.select_one('SELECT * FROM t WHERE id = %s', (1,))
+
+    assert not connection.statements('PREPARE')
+
+
+def test_query_is_prepared_after_threshold(db, connection):
+    for value in (1, 2, 3):
+        db.select_one('SELECT * FROM t WHERE id = %s', (value,))
+
+    assert connection.statements('PREPARE') == [
+        ('PREPARE qa_statement_1 AS SELECT * FROM t WHERE id = $1', None)]
+    assert connection.statements('EXECUTE') == [
+        ('EXECUTE qa_statement_1 (%s)', [2]),
+        ('EXECUTE qa_statement_1 (%s)', [3])]
+
+
+def test_mapping_binds_only_used_keys(db, connection):
+    query = 'SELECT * FROM t WHERE b = %(b)s AND a = %(a)s OR c = %(b)s'
+    for _ in range(2):
+        db.select_one(query, {'a': 1, 'b': 2, 'extra': 3})
+
+    assert connection.statements('PREPARE') == [
+        ('PREPARE qa_statement_1 AS '
+         'SELECT * FROM t WHERE b = $1 AND a = $2 OR c = $1', None)]
+    assert connection.statements('EXECUTE') == [
+        ('EXECUTE qa_statement_1 (%s, %s)', [2, 1])]
+
+
+def test_percent_is_unescaped_only_with_params(db, connection):
+    for _ in range(2):
+        db.select_one("SELECT * FROM t WHERE a LIKE 'x%%' AND id = %s", (1,))
+        db.select_one("SELECT * FROM t WHERE a LIKE 'x%%'")
+
+    assert [x[0] for x in connection.statements('PREPARE')] == [
+        "PREPARE qa_statement_1 AS SELECT * FROM t WHERE a LIKE 'x%' "
+        "AND id = $1",
+        "PREPARE qa_statement_2 AS SELECT * FROM t WHERE a LIKE 'x%%'"]
+
+
+@pytest.mark.parametrize('query, params', [
+    ('DELETE FROM a; DELETE FROM b', None),
+    ('DELETE FROM a WHERE id = %s; DELETE FROM b', (1,)),
+    ('CREATE TABLE t (id int)', None),
+    ('SELECT * FROM t WHERE id = %(id)s', {'other': 1})
+])
+def test_query_is_not_prepared(db, connection, query, params):
+    for _ in range(3):
+        db.execute(query, params)
+
+    assert not connection.statements('PREPARE')
+    assert connection.log == [(query, params)] * 3
+
+
+def test_failed_prepare_falls_back_to_plain_query(db, connection):
+    for _ in range(3):
+        db.select_one('SELECT unknown(%s)', (1,))
+
+    assert connection.log[1:5] == [
+        ('SAVEPOINT qa_prepare', None),
+        ('PREPARE qa_statement_1 AS SELECT unknown($1)', None),
+        ('ROLLBACK TO SAVEPOINT qa_prepare', None),
+        ('RELEASE SAVEPOINT qa_prepare', None)]
+    assert connection.log[-1] == ('SELECT unknown(%s)', (1,))
+
+
+def test_evicted_statements_are_deallocated(db, connection):
+    for query in ('SELECT 1', 'SELECT 1', 'SELECT 2', 'SELECT 3'):
+        db.select_one(query)
+
+    assert ('DEALLOCATE qa_statement_1', None) in connection.log
+    assert len(PreparedStatements.for_connection(connection, 2, 2).queries) \
+        == 2
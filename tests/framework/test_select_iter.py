@@ -0,0 +1,96 @@
+from uuid import uuid4
+
+import psycopg2
+import pytest
+
+from my_config import local_pg_dsn
+from utils.db import Postgres
+
+
+@pytest.fixture
+def pg_dsn() -> str:
+    if not local_pg_dsn:
+        pytest.skip('QA_AUTOTESTS_LOCAL_PG_DSN is not set')
+    try:
+        psycopg2.connect(local_pg_dsn).close()
+    except psycopg2.OperationalError as e:
+        pytest.skip(f'Local Postgres is not available: {e}')
+    return local_pg_dsn
+
+
+@pytest.fixture
+def observer(pg_dsn):
+    connection = psycopg2.connect(pg_dsn)
+    connection.autocommit = True
+    yield connection
+    connection.close()
+
+
+@pytest.fixture
+def table(observer) -> str:
+    name = f'qa_iter_{uuid4().hex[:8]}'
+    with observer.cursor() as cursor:
+        cursor.execute(f'CREATE TABLE {name} (id int)')
+        cursor.execute(f'INSERT INTO {name} SELECT generate_series(1, 25)')
+    yield name
+    with observer.cursor() as cursor:
+        cursor.execute(f'DROP TABLE {name}')
+
+
+@pytest.fixture
+def connection(pg_dsn):
+    connection = psycopg2.connect(pg_dsn)
+    yield connection
+    connection.close()
+
+
+def count_rows(observer, query) -> int:
+    with observer.cursor() as cursor:
+        cursor.execute(query)
+        return cursor.fetchone()[0]
+
+
+def test_pending_work_of_the_caller_is_kept(connection, observer, table):
+    with connection.cursor() as cursor:
+        cursor.execute(f'INSERT INTO {table} VALUES (100)')
+    rows = Postgres(connection).select_iter(f'SELECT * FROM {table}',
+                                            batch_size=10)
+    assert sum(1 for _ in rows) == 26
+    connection.commit()
+    assert count_rows(observer, f'SELECT count(*) FROM {table}') == 26
+
+
+def test_failed_query_keeps_pending_work(connection, observer, table):
+    with connection.cursor() as cursor:
+        cursor.execute(f'INSERT INTO {table} VALUES (100)')
+    with pytest.raises(psycopg2.errors.UndefinedTable):
+        list(Postgres(connection).select_iter('SELECT * FROM qa_missing'))
+    connection.commit()
+    assert count_rows(observer, f'SELECT count(*) FROM {table}') == 26
+
+
+@pytest.mark.parametrize('take', [None, 3], ids=['all', 'abandoned'])
+def test_autocommit_connection(connection, table, take):
+    connection.autocommit = True
+    rows = Postgres(connection).select_iter(f'SELECT * FROM {table}',
+                                            batch_size=10)
+    if take is None:
+        assert sum(1 for _ in rows) == 25
+    else:
+        assert [next(rows).id for _ in range(take)] == [1, 2, 3]
+        rows.close()
+    assert connection.autocommit
+    assert connection.status == psycopg2.extensions.STATUS_READY
+
+
+def test_isolated_block(connection, observer, table):
+    db = Postgres(connection)
+    with db.isolated():
+        db.execute(f'INSERT INTO {table} VALUES (100)')
+        assert [row.id for row in db.select_iter(
+            f'SELECT * FROM {table} WHERE id > 20')] == [21, 22, 23, 24, 25,
+                                                          100]
+        db.execute(f'INSERT INTO {table} VALUES (101)')
+        assert db.select_one(
+            f'SELECT count(*) AS count FROM {table}').count == 27
+    assert count_rows(observer, f'SELECT count(*) FROM {table}') == 25
@@ -0,0 +1,68 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from model.helpers.attachment_store import AttachmentStore
+from model.helpers.html_renderer import HtmlRenderer
+from model.helpers.sharded_report import ShardedReport
+
+
+@pytest.fixture
+def html_dir(tmp_path, monkeypatch):
+    """Report directories as conftest sets them with --html."""
+    html_dir = tmp_path / 'html'
+    monkeypatch.setattr(HtmlRenderer, 'report_dir', html_dir)
+    monkeypatch.setattr(AttachmentStore, 'directory',
+                        html_dir / 'attachments')
+    monkeypatch.setattr(AttachmentStore, 'compress', False)
+    return html_dir
+
+
+def make_report(when, extra=(), outcome='passed'):
+    return SimpleNamespace(nodeid='test_a.py::test_a', when=when,
+                           outcome=outcome, failed=outcome == 'failed',
+                           skipped=outcome == 'skipped', duration=0.1,
+                           longreprtext='', extra=list(extra))
+
+
+def read_shard(directory) -> dict:
+    shard, = (directory / 'shards').glob('*.js')
+    text = shard.read_text(encoding='utf-8')
+    return json.loads(text[text.index(', ') + 2:-3])
+
+
+def test_links_to_html_report_store_are_copied(html_dir, tmp_path):
+    url = HtmlRenderer.save_artifact(b'full content', '.txt')
+    extra = {'format_type': 'html',
+             'content': f'<pre>...{HtmlRenderer._anchor(url)}</pre>'}
+    sharded = ShardedReport(tmp_path / 'sharded')
+    for when in ('setup', 'call', 'teardown'):
+        sharded.pytest_runtest_logreport(
+            make_report(when, [extra] if when == 'call' else []))
+
+    content, = read_shard(tmp_path / 'sharded')['extras']
+    assert f'href="{url}"' in content
+    # The stored object of the html report may be removed by its cleanup
+    (html_dir / url).unlink()
+    assert (tmp_path / 'sharded' / url).read_bytes() == b'full content'
+
+
+def test_links_inside_sharded_report_are_kept(tmp_path, monkeypatch):
+    directory = tmp_path / 'sharded'
+    monkeypatch.setattr(HtmlRenderer, 'report_dir', directory)
+    monkeypatch.setattr(AttachmentStore, 'directory',
+                        directory / 'attachments')
+    url = HtmlRenderer.save_artifact(b'full content', '.txt')
+    sharded = ShardedReport(directory)
+    html = f'<pre>{HtmlRenderer._anchor(url)}</pre>'
+    assert sharded._localize(html) == html
+
+
+def test_rerun_starts_a_new_shard(html_dir, tmp_path):
+    sharded = ShardedReport(tmp_path / 'sharded')
+    for outcome in ('failed', 'passed'):
+        sharded.pytest_runtest_logreport(make_report('call', outcome=outcome))
+        sharded.pytest_runtest_logreport(make_report('teardown'))
+    assert read_shard(tmp_path / 'sharded')['longrepr'] == ''
+    assert sharded.tests['test_a.py::test_a']['outcome'] == 'failed'
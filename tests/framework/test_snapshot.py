@@ -0,0 +1,45 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+
+from model.helpers.snapshot import (
+    Snapshot,
+    SnapshotRecordedWarning
+)
+
+
+@pytest.fixture
+def snapshot(tmp_path) -> Snapshot:
+    yield Snapshot.activate(tmp_path, 'tests/test_module', 'TestA::test[1]')
+    Snapshot.deactivate()
+
+
+def test_missing_snapshot_is_recorded_with_warning(snapshot):
+    with pytest.warns(SnapshotRecordedWarning, match='"first"'):
+        assert snapshot.assert_match({'id': 1, 'name': 'a'}, 'first')
+    assert snapshot.assert_match({'name': 'a', 'id': 1}, 'first')
+
+
+def test_mismatch_fails(snapshot):
+    with pytest.warns(SnapshotRecordedWarning):
+        snapshot.assert_match({'id': 1}, 'first')
+    with pytest.raises(AssertionError, match='does not match'):
+        snapshot.assert_match({'id': 2}, 'first')
+
+
+def test_files_end_with_newline(snapshot, tmp_path):
+    with pytest.warns(SnapshotRecordedWarning):
+        snapshot.assert_match({'id': 1}, 'first')
+    files = list(Path(tmp_path).rglob('*.json'))
+    assert len(files) == 2
+    assert all(file.read_text(encoding='utf-8').endswith('}\n')
+               for file in files)
+
+
+def test_current_is_context_local(snapshot):
+    async def other_context():
+        Snapshot.deactivate()
+
+    asyncio.run(other_context())
+    assert Snapshot.get_current() is snapshot
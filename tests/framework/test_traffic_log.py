@@ -0,0 +1,69 @@
+import io
+import json
+from datetime import timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from model.helpers.traffic_log import TrafficLog
+
+
+@pytest.fixture
+def traffic_dir(tmp_path, monkeypatch):
+    monkeypatch.delenv('PYTEST_XDIST_WORKER', raising=False)
+    yield tmp_path
+    TrafficLog.close()
+
+
+def read_records(path) -> list:
+    with open(path, encoding='utf-8') as file:
+        return [json.loads(line) for line in file]
+
+
+def make_call(body):
+    original = SimpleNamespace(elapsed=timedelta(milliseconds=5),
+                               request=SimpleNamespace(body=body),
+                               content=b'{"id": 1}')
+    request = SimpleNamespace(method='POST', path_url='/items')
+    response = SimpleNamespace(original_response=original,
+                               url='http://localhost/items', status=201)
+    return request, response
+
+
+def test_previous_run_is_removed(traffic_dir):
+    (traffic_dir / 'traffic-gw7.jsonl').write_text('{}\n')
+    (traffic_dir / 'traffic-master.jsonl').write_text('{}\n')
+    (traffic_dir / 'other.jsonl').write_text('{}\n')
+    TrafficLog.clean(traffic_dir)
+    TrafficLog.open(traffic_dir)
+    TrafficLog.write_sql('select 1', [{'x': 1}], elapsed=0.001)
+    TrafficLog.close()
+    assert sorted(path.name for path in traffic_dir.iterdir()) == [
+        'other.jsonl', 'traffic-master.jsonl']
+    assert len(read_records(traffic_dir / 'traffic-master.jsonl')) == 1
+
+
+def test_open_truncates_the_file(traffic_dir):
+    for _ in range(2):
+        TrafficLog.open(traffic_dir)
+        TrafficLog.write_sql('select 1', None)
+        TrafficLog.close()
+    assert len(read_records(traffic_dir / 'traffic-master.jsonl')) == 1
+
+
+@pytest.mark.parametrize('body, expected', [
+    (None, 0),
+    (b'abc', 3),
+    ('абв', 6),
+    (bytearray(b'ab'), 2),
+    (iter([b'a', b'b']), None),
+    (io.BytesIO(b'abc'), None)
+], ids=['none', 'bytes', 'str', 'bytearray', 'generator', 'file'])
+def test_request_bytes(traffic_dir, body, expected):
+    TrafficLog.open(traffic_dir)
+    TrafficLog.write_http(*make_call(body), test='test_a')
+    TrafficLog.close()
+    record, = read_records(traffic_dir / 'traffic-master.jsonl')
+    assert record['request_bytes'] == expected
+    assert record['response_bytes'] == 9
+    assert record['test'] == 'test_a'
@@ -0,0 +1,88 @@
+import pickle
+from copy import deepcopy
+
+import pytest
+
+from utils.altcollections import TupleDict
+
+
+@pytest.fixture
+def data() -> TupleDict:
+    data = TupleDict(a=1, b={'c': 2}, d=3)
+    # Builds the values index, so every test checks that it is reset
+    assert data[:] == (1, {'c': 2}, 3)
+    return data
+
+
+def test_index_and_slice(data):
+    assert data[0] == 1
+    assert data[-1] == 3
+    assert data[1].c == 2
+    assert data['a'] == 1
+    assert data[::-1] == (3, {'c': 2}, 1)
+    assert data[-2:] == ({'c': 2}, 3)
+
+
+@pytest.mark.parametrize('item, expected', [
+    (slice(None, 2), (1, 2)),
+    (slice(1, None), (2, 3, 4)),
+    (slice(0, 4, 2), (1, 3)),
+    (slice(10, None), ()),
+    (slice(-2, None), (3, 4)),
+    (slice(None, None, -2), (4, 2))
+])
+def test_slice_before_index(item, expected):
+    assert TupleDict(a=1, b=2, c=3, d=4)[item] == expected
+
+
+@pytest.mark.parametrize('change, expected', [
+    (lambda x: x.__setitem__('a', 10), (10, {'c': 2}, 3)),
+    (lambda x: x.__setitem__('e', 4), (1, {'c': 2}, 3, 4)),
+    (lambda x: setattr(x, 'e', 4), (1, {'c': 2}, 3, 4)),
+    (lambda x: x.__delitem__('a'), ({'c': 2}, 3)),
+    (lambda x: x.pop('a'), ({'c': 2}, 3)),
+    (lambda x: x.popitem(), (1, {'c': 2})),
+    (lambda x: x.clear(), ()),
+    (lambda x: x.setdefault('e', 4), (1, {'c': 2}, 3, 4)),
+    (lambda x: x.update(a=10), (10, {'c': 2}, 3)),
+    (lambda x: x.update({'e': 4}), (1, {'c': 2}, 3, 4)),
+    (lambda x: x.__ior__({'e': 4}), (1, {'c': 2}, 3, 4))
+], ids=['set', 'add', 'setattr', 'del', 'pop', 'popitem', 'clear',
+        'setdefault', 'update kwargs', 'update dict', 'ior'])
+def test_index_is_reset_on_change(data, change, expected):
+    change(data)
+    assert data[:] == expected
+    assert tuple(data[index] for index in range(len(data))) == expected
+
+
+def test_setdefault_existing_key_keeps_value(data):
+    assert data.setdefault('a', 10) == 1
+    assert data[0] == 1
+
+
+@pytest.mark.parametrize('create', [
+    lambda: TupleDict({1: 'a'}),
+    lambda: TupleDict().__setitem__(1, 'a'),
+    lambda: TupleDict().update({1: 'a'})
+], ids=['init', 'setitem', 'update'])
+def test_int_keys_are_rejected(create):
+    with pytest.raises(TypeError):
+        create()
+
+
+def test_crop_astuple(data):
+    assert data.crop_astuple('b') == (1, 3)
+    assert data.crop_astuple('a', 'd') == ({'c': 2},)
+    assert data.crop_astuple() == data[:]
+    assert data[:] == (1, {'c': 2}, 3)
+    with pytest.raises(KeyError):
+        data.crop_astuple('a', 'missing')
+
+
+def test_copies_have_own_index(data):
+    for copy in (deepcopy(data), data.copy(), data.crop('d'),
+                 pickle.loads(pickle.dumps(data))):
+        assert isinstance(copy, TupleDict)
+        copy['a'] = 10
+        assert copy[0] == 10
+        assert data[0] == 1
@@ -0,0 +1,66 @@
+import pickle
+from collections.abc import (
+    Mapping,
+    Sequence
+)
+
+import pytest
+
+from utils.altcollections import (
+    ExtDict,
+    ExtDictView,
+    ListView,
+    TupleDictView,
+    unwrap
+)
+
+
+@pytest.fixture
+def data() -> dict:
+    return {'a': {'b': 1}, 'items': [{'id': 1}, {'id': 2}], 'name': 'x'}
+
+
+def test_access_without_copy(data):
+    view = ExtDictView(data)
+    assert view.a.b == 1
+    assert view['items'][1].id == 2
+    assert view.unwrap() is data
+    assert unwrap(view['items']) is data['items']
+
+
+def test_list_view_is_sequence_not_list(data):
+    items = ExtDictView(data)['items']
+    assert isinstance(items, ListView)
+    assert isinstance(items, Sequence)
+    assert not isinstance(items, list)
+    assert items == data['items']
+    assert isinstance(items[:1], ListView)
+
+
+def test_read_only(data):
+    view = ExtDictView(data)
+    with pytest.raises(TypeError):
+        view.name = 'y'
+    with pytest.raises(TypeError):
+        view['name'] = 'y'
+
+
+def test_copy_is_independent(data):
+    copy = ExtDictView(data).copy()
+    assert isinstance(copy, ExtDict)
+    copy.a.b = 2
+    assert data['a']['b'] == 1
+
+
+def test_tuple_dict_view_index(data):
+    view = TupleDictView(data)
+    assert view[2] == 'x'
+    assert view[0].b == 1
+    assert isinstance(view, Mapping)
+
+
+def test_pickle(data):
+    view = pickle.loads(pickle.dumps(ExtDictView(data)))
+    assert view == data
+    with pytest.raises(AttributeError):
+        getattr(view, 'missing')
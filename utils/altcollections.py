@@ -1,9 +1,16 @@
+from collections.abc import (
+    Mapping,
+    Sequence
+)
 from copy import deepcopy
+from itertools import islice
+from typing import NamedTuple
 
 from deepdiff import DeepDiff
 
 
 ARRAYS = (list, tuple, set)
+SCALARS = (str, int, float, bool, type(None))
 
 
 class ExtDict(dict):
@@ -115,6 +122,13 @@ class ExtDict(dict):
         and arrays inside it."""
         return RecursiveSort(self, __reverse__=reverse)
 
+    @classmethod
+    def _from_items(cls, items):
+        """Creates instance from already converted (key, value) pairs."""
+        new = dict.__new__(cls)
+        dict.update(new, items)
+        return new
+
 
 class TupleDict(ExtDict):
     """
@@ -133,12 +147,21 @@ class TupleDict(ExtDict):
         из которого убрано значение, соответствующее ключу словаря, переданному методу.
     """
 
+    # Tuple of values for access by index, it is reset on every change
+    _values_index = None
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
     def __getitem__(self, item, *, _called_as_attr=False):
-        if type(item) in (int, slice):
-            return tuple(self.values())[item]
+        if type(item) is int:
+            return self._values()[item]
+        elif type(item) is slice:
+            if self._values_index is None and _is_forward_slice(item):
+                # Only the values up to the end of the slice are read
+                return tuple(islice(dict.values(self),
+                                    item.start, item.stop, item.step))
+            return self._values()[item]
         else:
             return super().__getitem__(item, _called_as_attr=False)
 
@@ -148,11 +171,211 @@ class TupleDict(ExtDict):
                             f'{self.__class__.__name__} keys')
         else:
             super().__setitem__(key, value)
+            self._reset_values()
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self._reset_values()
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def pop(self, key, *args):
+        result = super().pop(key, *args)
+        self._reset_values()
+        return result
+
+    def popitem(self):
+        result = super().popitem()
+        self._reset_values()
+        return result
+
+    def clear(self):
+        super().clear()
+        self._reset_values()
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return dict.__getitem__(self, key)
+
+    def update(self, __m=None, /, **kwargs) -> None:
+        super().update(__m, **kwargs)
+        self._reset_values()
+
+    @classmethod
+    def _from_items(cls, items):
+        for key, _ in items:
+            if isinstance(key, int):
+                raise TypeError(f'Integers cannot be added as '
+                                f'{cls.__name__} keys')
+        return super()._from_items(items)
 
     def crop_astuple(self, *keys):
         """Deletes provided keys from the dictionary and
         returns tuple of values of new TupleDict."""
-        return self.crop(*keys)[:]
+        for key in keys:
+            if not dict.__contains__(self, key):
+                raise KeyError(key)
+        # Values are not copied: the dictionary itself is not changed
+        excluded = set(keys)
+        return tuple(value for key, value in dict.items(self)
+                     if key not in excluded)
+
+    def _values(self) -> tuple:
+        if self._values_index is None:
+            object.__setattr__(self, '_values_index',
+                               tuple(dict.values(self)))
+        return self._values_index
+
+    def _reset_values(self):
+        if self._values_index is not None:
+            object.__setattr__(self, '_values_index', None)
+
+
+def _is_forward_slice(item: slice) -> bool:
+    return ((item.start is None or item.start >= 0)
+            and (item.stop is None or item.stop >= 0)
+            and (item.step is None or item.step > 0))
+
+
+class PersistentExtDict(ExtDict):
+    """
+    ExtDict with structural sharing (path copying) between copies.
+    copy() and so crop, add, replace and multiplication copy only the top
+    level: nested dictionaries and lists are shared with the source.
+    A shared nested container is copied (again only its top level) the
+    first time it is taken from a dictionary which does not own it yet:
+    by key, attribute, get(), items(), values(), pop(), popitem(),
+    setdefault(), iteration-based copies (dict(d), {**d}) or to_dict().
+    So a derived copy can be modified at any depth without affecting the
+    source, and unchanged subtrees are never copied.
+    Note: references to nested containers taken before copy() still
+    point to the containers shared by both dictionaries; dict.items(d)
+    and other unbound dict methods bypass the ownership as well.
+    """
+    # Keys whose nested containers are owned by this dictionary exclusively
+    _owned = None
+
+    def __init__(self, *args, **kwargs):
+        dict.__init__(self, *args, **kwargs)
+        for key, value in dict.items(self):
+            self[key] = value
+
+    def __getattr__(self, item):
+        return PersistentExtDict.__getitem__(self, item, _called_as_attr=True)
+
+    def __getitem__(self, item, *, _called_as_attr=False):
+        if not dict.__contains__(self, item):
+            return super().__getitem__(item, _called_as_attr=_called_as_attr)
+        return self._own(item)
+
+    def __setitem__(self, key, value):
+        if isinstance(value, PersistentExtDict):
+            dict.__setitem__(self, key, value.copy())
+        else:
+            super().__setitem__(key, value)
+        self._mark_owned([key])
+
+    def __deepcopy__(self, memo):
+        return self.__class__(deepcopy(dict(self.items()), memo=memo))
+
+    def __iter__(self):
+        # A dict subclass with its own __iter__ is merged by dict(), {**d}
+        # and dict.update() via keys() and __getitem__, which owns values,
+        # instead of the C-level copy of the shared references
+        return dict.__iter__(self)
+
+    def get(self, key, default=None):
+        if dict.__contains__(self, key):
+            return self._own(key)
+        return default
+
+    def items(self):
+        self._own_all()
+        return dict.items(self)
+
+    def values(self):
+        self._own_all()
+        return dict.values(self)
+
+    def pop(self, key, *args):
+        if dict.__contains__(self, key):
+            self._own(key)
+        return dict.pop(self, key, *args)
+
+    def popitem(self):
+        if dict.__len__(self):
+            self._own(next(reversed(dict.keys(self))))
+        return dict.popitem(self)
+
+    def to_dict(self) -> dict:
+        """Plain dict with nested containers owned by this dictionary, so
+        changes of the result do not affect other copies."""
+        return dict(self.items())
+
+    def setdefault(self, key, default=None):
+        if not dict.__contains__(self, key):
+            self[key] = default
+        return self._own(key)
+
+    def update(self, __m=None, /, **kwargs) -> None:
+        super().update(__m, **kwargs)
+        keys = list(kwargs)
+        if __m:
+            keys.extend(__m.keys() if hasattr(__m, 'keys')
+                        else (x[0] for x in __m))
+        self._mark_owned(keys)
+
+    def crop(self, *keys):
+        """Deletes provided keys from the dictionary and returns new ExtDict."""
+        new = self.copy()
+        for key in keys:
+            dict.pop(new, key)
+        return new
+
+    def copy(self):
+        """Works as copy.deepcopy(), but shares nested containers."""
+        new = dict.__new__(self.__class__)
+        dict.update(new, self)
+        # Nested containers are shared by both dictionaries now
+        object.__setattr__(self, '_owned', None)
+        return new
+
+    @classmethod
+    def _from_items(cls, items):
+        new = super()._from_items(items)
+        # Converted values are new objects, nobody else refers to them
+        new._mark_owned(dict.keys(new))
+        return new
+
+    def _mark_owned(self, keys):
+        if self._owned is None:
+            object.__setattr__(self, '_owned', set())
+        self._owned.update(keys)
+
+    def _own(self, key):
+        value = dict.__getitem__(self, key)
+        if isinstance(value, (dict, list, tuple)) and (
+                self._owned is None or key not in self._owned):
+            value = self._copy_shared(value)
+            dict.__setitem__(self, key, value)
+            self._mark_owned([key])
+        return value
+
+    def _own_all(self):
+        for key in dict.keys(self):
+            self._own(key)
+
+    @classmethod
+    def _copy_shared(cls, value):
+        if isinstance(value, PersistentExtDict):
+            return value.copy()
+        elif isinstance(value, (list, tuple)):
+            # Items of lists are not tracked, so they are owned by the copy
+            return type(value)([cls._copy_shared(x) for x in value])
+        return value
 
 
 class ExtendedList(list):
@@ -173,33 +396,201 @@ class ExtendedList(list):
         return deepcopy(self)
 
 
-class _RecursiveConverter:
-    """Using convert() method one can convert dictionaries recursively."""
-
-    default_destination = ExtDict
-
-    def __init__(self):
-        self.dest_class = self.default_destination
+class ExtDictView(Mapping):
+    """
+    Read-only view of an existing dict/list tree with the same access as
+    ExtDict has: d['key'] and d.key. Nothing is copied or converted:
+    nested dictionaries and lists are wrapped into views on access.
+    Use it instead of ExtDict for big read-mostly trees (e.g. response
+    bodies), when conversion of every nested value is too expensive.
+    unwrap() returns the underlying data, copy() - independent ExtDict.
+    """
+    __slots__ = ('_data',)
 
-    def __call__(self, source, dest_class=default_destination):
-        self.dest_class = dest_class
-        return self._check_type(source)
+    def __init__(self, data):
+        object.__setattr__(self, '_data', data)
 
-    def _check_type(self, value):
+    @classmethod
+    def wrap(cls, value):
         if hasattr(value, 'keys'):
-            return self._convert_dict(value)
-        elif isinstance(value, ARRAYS):
-            return self._convert_array(value)
+            return cls(value)
+        elif isinstance(value, (list, tuple)):
+            return ListView(value, cls)
         return value
 
-    def _convert_dict(self, dictionary):
-        result = self.dest_class(dictionary)
-        for key, value in result.items():
-            result[key] = self._check_type(value)
-        return result
+    def unwrap(self):
+        return self._data
+
+    def __getitem__(self, item):
+        return self.wrap(self._data[item])
+
+    def __getattr__(self, item):
+        # Special and slot names are never keys (e.g. on unpickling)
+        if item.startswith('__') or item == '_data':
+            raise AttributeError(item)
+        try:
+            return self[item]
+        except KeyError:
+            raise AttributeError(
+                f"Instance of class {self.__class__.__name__} "
+                f"does not have attribute '{item}'")
+
+    def __setattr__(self, key, value):
+        raise TypeError(f'{self.__class__.__name__} is read-only')
+
+    def __reduce__(self):
+        return self.__class__, (self._data,)
+
+    def __contains__(self, item):
+        return item in self._data
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __eq__(self, other):
+        return self._data == unwrap(other)
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({self._data!r})'
+
+    def copy(self):
+        return RecursiveConverter(self._data)
+
+
+class TupleDictView(ExtDictView):
+    """ExtDictView with access to values by index and slice as TupleDict."""
+    __slots__ = ()
+
+    def __getitem__(self, item):
+        if type(item) in (int, slice):
+            return self.wrap(tuple(self._data.values())[item])
+        return super().__getitem__(item)
+
+    def copy(self):
+        return RecursiveConverter(self._data, TupleDict)
+
+
+class ListView(Sequence):
+    """
+    Read-only view of a list, nested dictionaries are wrapped on access.
+    It is a Sequence, not a list: isinstance(view, list) is False, so check
+    isinstance(view, Sequence) or compare unwrap(view) instead. A list
+    subclass would have to copy the items, which the view exists to avoid.
+    """
+    __slots__ = ('_data', '_view_class')
+
+    def __init__(self, data, view_class=ExtDictView):
+        self._data = data
+        self._view_class = view_class
+
+    def unwrap(self):
+        return self._data
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return ListView(self._data[item], self._view_class)
+        return self._view_class.wrap(self._data[item])
 
-    def _convert_array(self, array):
-        return type(array)([self._check_type(item) for item in array])
+    def __len__(self):
+        return len(self._data)
+
+    def __eq__(self, other):
+        return self._data == unwrap(other)
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({self._data!r})'
+
+
+def unwrap(value):
+    """Returns data wrapped into ExtDictView/ListView, or the value itself."""
+    if isinstance(value, (ExtDictView, ListView)):
+        return value.unwrap()
+    return value
+
+
+_DICT = 'dict'
+_ARRAY = 'array'
+_PLAIN_TYPES = frozenset(SCALARS)
+
+
+def _node_kind(value):
+    if type(value) in _PLAIN_TYPES:
+        return None
+    elif hasattr(value, 'keys'):
+        return _DICT
+    elif isinstance(value, ARRAYS):
+        return _ARRAY
+    return None
+
+
+def _node_items(value):
+    # dict.items() does not trigger copying of shared PersistentExtDict values
+    return dict.items(value) if isinstance(value, dict) else value.items()
+
+
+def _builder(dest_class):
+    """Creates dest_class instance from already converted items."""
+    return getattr(dest_class, '_from_items', dest_class)
+
+
+class _RecursiveConverter:
+    """
+    Using convert() method one can convert dictionaries recursively.
+    Stateless and iterative: every node of the source is visited once,
+    and the nesting depth is not limited by the recursion limit.
+    """
+
+    default_destination = ExtDict
+
+    def __call__(self, source, dest_class=default_destination):
+        kind = _node_kind(source)
+        if kind is None:
+            return source
+        build = _builder(dest_class)
+
+        # Frame: [source node, kind, iterator, converted items, key in parent]
+        stack = [self._frame(source, kind, None)]
+        while True:
+            frame = stack[-1]
+            node, kind, items, converted = frame[:4]
+            for item in items:
+                value = item[1] if kind is _DICT else item
+                if type(value) in _PLAIN_TYPES:
+                    converted.append(item)
+                    continue
+                child_kind = _node_kind(value)
+                if child_kind is None:
+                    converted.append(item)
+                else:
+                    key = item[0] if kind is _DICT else None
+                    stack.append(self._frame(value, child_kind, key))
+                    break
+            else:
+                stack.pop()
+                if kind is _DICT:
+                    result = build(converted)
+                else:
+                    result = type(node)(converted)
+                if not stack:
+                    return result
+                parent = stack[-1]
+                parent[3].append(
+                    (frame[4], result) if parent[1] is _DICT else result)
+
+    @staticmethod
+    def _frame(node, kind, key) -> list:
+        items = _node_items(node) if kind is _DICT else node
+        return [node, kind, iter(items), [], key]
+
+
+class _SortOptions(NamedTuple):
+    exclude_items: set
+    exclude_pairs: list
+    exclude_all: bool
+    reverse: bool
 
 
 class _RecursiveSort:
@@ -217,87 +608,130 @@ class _RecursiveSort:
         Чтобы словарь был исключён, в нём должны находиться все переданные пары.
     - параметр __reverse__ (по умолчанию False): при значении True сортировка
         осуществляется в обратном порядке.
+    Не хранит состояние между вызовами, поэтому безопасна для потоков.
     """
 
-    def __init__(self):
-        self._exclude_items = set()
-        self._exclude_pairs = []
-        self._exclude_all = False
-        self._reverse = False
+    # Unlike RecursiveConverter the sort stays recursive: the iterative
+    # version was slower (about 0.8x, see utils/benchmark_recursive.py), and
+    # the depth is not a concern here, as bodies parsed by json are limited
+    # by the recursion limit as well.
 
     def __call__(self, data, *args, __reverse__=False, __exclude_all__=False):
-        self._exclude_items = {x for x in args if not isinstance(x, ARRAYS)}
-        self._exclude_pairs = [tuple(x) for x in args if isinstance(x, ARRAYS)]
-        self._exclude_all = __exclude_all__
-        self._reverse = __reverse__
-        return self._check_type(data)
-
-    def _check_type(self, value):
-        if hasattr(value, 'keys'):
-            return self._sort_dict(value)
+        options = _SortOptions(
+            exclude_items={x for x in args if not isinstance(x, ARRAYS)},
+            exclude_pairs=[tuple(x) for x in args if isinstance(x, ARRAYS)],
+            exclude_all=__exclude_all__,
+            reverse=__reverse__
+        )
+        return self._check_type(data, options)
+
+    def _check_type(self, value, options):
+        if type(value) in _PLAIN_TYPES:
+            return value
+        elif hasattr(value, 'keys'):
+            return self._sort_dict(value, options)
         elif isinstance(value, ARRAYS):
-            return self._sort_array(value)
+            return self._sort_array(value, options)
         return value
 
-    def _check_items_exist(self, data):
+    @staticmethod
+    def _check_items_exist(data, options):
         try:
-            if self._exclude_all:
-                if set(data) & self._exclude_items == self._exclude_items:
+            if options.exclude_all:
+                if set(data) & options.exclude_items == options.exclude_items:
                     return True
             else:
-                for item in self._exclude_items:
+                for item in options.exclude_items:
                     if item in set(data):
                         return True
         except TypeError:
             return True
         return False
 
-    def _check_pairs_exist(self, data):
+    @staticmethod
+    def _check_pairs_exist(data, options):
         i = 0
-        for pair in self._exclude_pairs:
-            if pair in data.items():
-                if not self._exclude_all:
+        for pair in options.exclude_pairs:
+            if pair in _node_items(data):
+                if not options.exclude_all:
                     return True
                 i += 1
-        return i > 0 and i == len(self._exclude_pairs)
+        return i > 0 and i == len(options.exclude_pairs)
 
-    def _sort_dict(self, data):
+    def _sort_dict(self, data, options):
         match = 0
-        if self._check_items_exist(data):
+        # Without exclusions the checks can not match, they are skipped
+        if ((options.exclude_items or options.exclude_all)
+                and self._check_items_exist(data, options)):
             match += 1
-        if self._check_pairs_exist(data):
+        if options.exclude_pairs and self._check_pairs_exist(data, options):
             match += 1
-        result = data.items()
-        if (match == 0) or (self._exclude_all and match < 2):
-            result = sorted(result, reverse=self._reverse)
-        return type(data)(
-            [(key, self._check_type(value)) for key, value in result])
+        result = _node_items(data)
+        if (match == 0) or (options.exclude_all and match < 2):
+            result = sorted(result, reverse=options.reverse)
+        return _builder(type(data))(
+            [(key, self._check_type(value, options)) for key, value in result])
 
-    def _sort_array(self, array):
+    def _sort_array(self, array, options):
         match = False
-        if self._exclude_items:
-            match = self._check_items_exist(array)
-        result = ([self._check_type(item) for item in array])
+        if options.exclude_items:
+            match = self._check_items_exist(array, options)
+        result = [self._check_type(item, options) for item in array]
         if not match:
             try:
-                result = sorted(result, reverse=self._reverse)
+                result = sorted(result, reverse=options.reverse)
             except TypeError:
                 pass
         return type(array)(result)
 
 
+DICTS = (dict, ExtDict, TupleDict, PersistentExtDict)
+
+
 class DictDiff(DeepDiff):
     """Allows to compare two instances of custom dictionaries and basic dict"""
 
     def __init__(self, *args, **kwargs):
         if 'ignore_type_in_groups' not in kwargs:
-            kwargs['ignore_type_in_groups'] = [
-                (dict, ExtDict),
-                (dict, TupleDict),
-                (ExtDict, TupleDict)
-            ]
+            kwargs['ignore_type_in_groups'] = [DICTS]
         super().__init__(*args, **kwargs)
 
 
+def structures_equal(first, second) -> bool:
+    """
+    Fast structural equality of JSON-like data, used as a pre-check before
+    the diff engines (DictDiff, JsonDiff). dict, ExtDict, TupleDict and
+    PersistentExtDict are treated as the same type, any other types must
+    match exactly (as DeepDiff requires).
+    Returns False for unsupported types, so that the caller falls back
+    to the full diff.
+    """
+    stack = [(first, second)]
+    while stack:
+        left, right = stack.pop()
+        if left is right:
+            continue
+        left_type, right_type = type(left), type(right)
+        if left_type in DICTS:
+            if right_type not in DICTS or len(left) != len(right):
+                return False
+            for key, value in left.items():
+                if key not in right:
+                    return False
+                stack.append((value, dict.__getitem__(right, key)))
+        elif left_type is not right_type:
+            return False
+        elif left_type in (list, tuple):
+            if len(left) != len(right):
+                return False
+            stack.extend(zip(left, right))
+        elif left_type in SCALARS:
+            if left != right:
+                return False
+        else:
+            return False
+    return True
+
+
 RecursiveConverter = _RecursiveConverter()
 RecursiveSort = _RecursiveSort()
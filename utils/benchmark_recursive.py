@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+
+"""
+Benchmark of RecursiveConverter and RecursiveSort against their previous
+implementations (kept here as _Legacy* classes). RecursiveConverter is
+iterative, RecursiveSort stays recursive, so only the converter handles
+the nesting deeper than the recursion limit.
+Run it as a module from the project root (running the file directly
+does not find the 'utils' package):
+    python -m utils.benchmark_recursive --items 100 --depth 5 --repeat 5
+"""
+import argparse
+import sys
+import timeit
+
+from utils.altcollections import (
+    ARRAYS,
+    ExtDict,
+    RecursiveConverter,
+    RecursiveSort
+)
+
+
+ITEMS = 100
+DEPTH = 5
+REPEAT = 5
+DEEP_NESTING = 10000
+
+
+class _LegacyExtDict(dict):
+    """ExtDict conversion part, as it works with the legacy converter."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for key, value in self.items():
+            self[key] = value
+
+    def __setitem__(self, key, value):
+        dict.__setitem__(self, key, _legacy_converter(value, self.__class__))
+
+
+class _LegacyRecursiveConverter:
+
+    default_destination = _LegacyExtDict
+
+    def __init__(self):
+        self.dest_class = self.default_destination
+
+    def __call__(self, source, dest_class=default_destination):
+        self.dest_class = dest_class
+        return self._check_type(source)
+
+    def _check_type(self, value):
+        if hasattr(value, 'keys'):
+            return self._convert_dict(value)
+        elif isinstance(value, ARRAYS):
+            return self._convert_array(value)
+        return value
+
+    def _convert_dict(self, dictionary):
+        result = self.dest_class(dictionary)
+        for key, value in result.items():
+            result[key] = self._check_type(value)
+        return result
+
+    def _convert_array(self, array):
+        return type(array)([self._check_type(item) for item in array])
+
+
+class _LegacyRecursiveSort:
+
+    def __init__(self):
+        self._exclude_items = set()
+        self._exclude_pairs = []
+        self._exclude_all = False
+        self._reverse = False
+
+    def __call__(self, data, *args, __reverse__=False, __exclude_all__=False):
+        self._exclude_items = {x for x in args if not isinstance(x, ARRAYS)}
+        self._exclude_pairs = [tuple(x) for x in args if isinstance(x, ARRAYS)]
+        self._exclude_all = __exclude_all__
+        self._reverse = __reverse__
+        return self._check_type(data)
+
+    def _check_type(self, value):
+        if hasattr(value, 'keys'):
+            return self._sort_dict(value)
+        elif isinstance(value, ARRAYS):
+            return self._sort_array(value)
+        return value
+
+    def _check_items_exist(self, data):
+        try:
+            if self._exclude_all:
+                if set(data) & self._exclude_items == self._exclude_items:
+                    return True
+            else:
+                for item in self._exclude_items:
+                    if item in set(data):
+                        return True
+        except TypeError:
+            return True
+        return False
+
+    def _check_pairs_exist(self, data):
+        i = 0
+        for pair in self._exclude_pairs:
+            if pair in data.items():
+                if not self._exclude_all:
+                    return True
+                i += 1
+        return i > 0 and i == len(self._exclude_pairs)
+
+    def _sort_dict(self, data):
+        match = 0
+        if self._check_items_exist(data):
+            match += 1
+        if self._check_pairs_exist(data):
+            match += 1
+        result = data.items()
+        if (match == 0) or (self._exclude_all and match < 2):
+            result = sorted(result, reverse=self._reverse)
+        return type(data)(
+            [(key, self._check_type(value)) for key, value in result])
+
+    def _sort_array(self, array):
+        match = False
+        if self._exclude_items:
+            match = self._check_items_exist(array)
+        result = ([self._check_type(item) for item in array])
+        if not match:
+            try:
+                result = sorted(result, reverse=self._reverse)
+            except TypeError:
+                pass
+        return type(array)(result)
+
+
+_legacy_converter = _LegacyRecursiveConverter()
+_legacy_sort = _LegacyRecursiveSort()
+
+
+def make_data(items, depth):
+    """List of 'items' records, every record has 'depth' nested levels."""
+    def record(i):
+        node = {'id': i, 'tags': ['b', 'a', 'c'], 'value': 'x' * 10}
+        for level in range(depth):
+            node = {'level': level, 'child': node, 'list': [3, 1, 2]}
+        return node
+
+    return {'items': [record(i) for i in range(items)]}
+
+
+def make_deep(depth):
+    data = {}
+    node = data
+    for _ in range(depth):
+        node['n'] = {}
+        node = node['n']
+    return data
+
+
+def measure(name, function, repeat):
+    try:
+        seconds = min(timeit.repeat(function, number=1, repeat=repeat))
+    except RecursionError:
+        print(f'{name:<40} RecursionError')
+        return None
+    print(f'{name:<40} {seconds * 1000:10.2f} ms')
+    return seconds
+
+
+def run(items, depth, repeat, deep):
+    data = make_data(items, depth)
+    print(f'Data: {items} items, {depth} nested levels\n')
+
+    legacy = measure('RecursiveConverter (legacy)',
+                     lambda: _legacy_converter(data), repeat)
+    current = measure('RecursiveConverter',
+                      lambda: RecursiveConverter(data), repeat)
+    if legacy and current:
+        print(f'{"speedup":<40} {legacy / current:10.1f} x\n')
+
+    legacy = measure('RecursiveSort (legacy)',
+                     lambda: _legacy_sort(data), repeat)
+    current = measure('RecursiveSort',
+                      lambda: RecursiveSort(data), repeat)
+    if legacy and current:
+        print(f'{"speedup":<40} {legacy / current:10.1f} x\n')
+
+    assert RecursiveSort(data) == _legacy_sort(data)
+    assert RecursiveConverter(data) == _legacy_converter(data)
+    assert isinstance(RecursiveConverter(data)['items'][0], ExtDict)
+
+    deep_data = make_deep(deep)
+    print(f'Nesting depth {deep} (recursion limit '
+          f'{sys.getrecursionlimit()}):')
+    measure('RecursiveConverter (legacy)',
+            lambda: _legacy_converter(deep_data), 1)
+    measure('RecursiveConverter', lambda: RecursiveConverter(deep_data), 1)
+    measure('RecursiveSort (legacy)', lambda: _legacy_sort(deep_data), 1)
+    measure('RecursiveSort', lambda: RecursiveSort(deep_data), 1)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-i', '--items', type=int, default=ITEMS,
+                        help='Count of records in the test data.')
+    parser.add_argument('-d', '--depth', type=int, default=DEPTH,
+                        help='Nesting level of every record. The legacy '
+                             'converter is exponential on it, keep it low.')
+    parser.add_argument('-r', '--repeat', type=int, default=REPEAT,
+                        help='Count of repeats, the best time is shown.')
+    parser.add_argument('--deep', type=int, default=DEEP_NESTING,
+                        help='Nesting level for the recursion limit check.')
+    args = parser.parse_args()
+    run(args.items, args.depth, args.repeat, args.deep)
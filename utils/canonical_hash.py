@@ -0,0 +1,130 @@
+"""
+Canonical structural hashing of JSON-like data.
+
+Two values have the same digest if and only if their canonical JSON forms
+are equal (as for json.dumps(value, sort_keys=True)): dict, ExtDict and
+TupleDict are the same, lists and tuples are the same, keys order does not
+matter, but 1, 1.0 and True are different values.
+"""
+import hashlib
+from collections import Counter
+from operator import itemgetter
+
+
+DIGEST_SIZE = 16
+
+_DICT = b'd'
+_LIST = b'l'
+
+
+def _blake(data: bytes = b''):
+    return hashlib.blake2b(data, digest_size=DIGEST_SIZE)
+
+
+class CanonicalHasher:
+    """
+    Computes digests iteratively (without recursion limit) and memoizes
+    digest of every container node by its id, so shared subtrees and
+    repeated calls for the same objects are hashed once.
+    Memoized digests are not invalidated: use a new instance (or
+    canonical_digest()) if data can be modified between calls.
+    """
+
+    def __init__(self):
+        self._memo = {}
+
+    def digest(self, value) -> bytes:
+        result = self._leaf(value)
+        if result is not None:
+            return result
+        cached = self._memo.get(id(value))
+        if cached is not None:
+            return cached[1]
+
+        stack = [self._open(value)]
+        while stack:
+            node, hasher, items = stack[-1]
+            for key, child in items:
+                if key is not None:
+                    hasher.update(key)
+                child_digest = self._leaf(child)
+                if child_digest is None:
+                    cached = self._memo.get(id(child))
+                    if cached is None:
+                        # Digest of the child is added to the parent
+                        # when the child frame is completed
+                        stack.append(self._open(child))
+                        break
+                    child_digest = cached[1]
+                hasher.update(child_digest)
+            else:
+                stack.pop()
+                result = hasher.digest()
+                # Keep a reference to the node, so that its id is not reused
+                self._memo[id(node)] = (node, result)
+                if stack:
+                    stack[-1][1].update(result)
+        return result
+
+    def hexdigest(self, value) -> str:
+        return self.digest(value).hex()
+
+    def counter(self, sequence) -> Counter:
+        """Multiset of digests of sequence items."""
+        return Counter(self.digest(x) for x in sequence)
+
+    def _open(self, node) -> tuple:
+        if hasattr(node, 'keys'):
+            items = sorted(((self._key(k), v) for k, v in node.items()),
+                           key=itemgetter(0))
+            hasher = _blake(_DICT + len(items).to_bytes(8, 'big'))
+        elif isinstance(node, (list, tuple)):
+            items = [(None, x) for x in node]
+            hasher = _blake(_LIST + len(items).to_bytes(8, 'big'))
+        else:
+            raise TypeError(f'Object of type {type(node).__name__} '
+                            f'is not JSON serializable')
+        return node, hasher, iter(items)
+
+    @staticmethod
+    def _leaf(value):
+        if isinstance(value, str):
+            encoded = value.encode('utf-8', 'surrogatepass')
+            return _blake(b's' + encoded).digest()
+        if value is None:
+            return _blake(b'z').digest()
+        if value is True:
+            return _blake(b't').digest()
+        if value is False:
+            return _blake(b'f').digest()
+        if isinstance(value, int):
+            return _blake(b'i' + int.__repr__(value).encode()).digest()
+        if isinstance(value, float):
+            return _blake(b'n' + float.__repr__(value).encode()).digest()
+        return None
+
+    @staticmethod
+    def _key(key) -> bytes:
+        # The same conversion of keys as json.dumps does
+        if isinstance(key, str):
+            pass
+        elif key is None:
+            key = 'null'
+        elif key is True:
+            key = 'true'
+        elif key is False:
+            key = 'false'
+        elif isinstance(key, int):
+            key = int.__repr__(key)
+        elif isinstance(key, float):
+            key = float.__repr__(key)
+        else:
+            raise TypeError(f'keys must be str, int, float, bool or None, '
+                            f'not {type(key).__name__}')
+        encoded = key.encode('utf-8', 'surrogatepass')
+        return len(encoded).to_bytes(8, 'big') + encoded
+
+
+def canonical_digest(value) -> str:
+    """Hex digest of the canonical form of value."""
+    return CanonicalHasher().hexdigest(value)
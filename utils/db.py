@@ -1,35 +1,236 @@
+import asyncio
+import io
+import itertools
+import json
+import re
+import select
+import threading
+import time
+import weakref
 from abc import (
     ABC,
     abstractmethod
 )
+from collections import (
+    OrderedDict,
+    deque
+)
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial
+from typing import (
+    NamedTuple,
+    Optional
+)
+from uuid import uuid4
 
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2 import sql
+from psycopg2.extensions import STATUS_READY
+from psycopg2.extras import (
+    RealDictCursor,
+    execute_values
+)
 from sshtunnel import SSHTunnelForwarder
 
 from model.helpers.logger import Logger
-from utils.altcollections import RecursiveConverter
+from model.helpers.traffic_log import TrafficLog
+from utils.altcollections import (
+    ExtDictView,
+    RecursiveConverter
+)
+
+
+# Escapes of the COPY text format
+_COPY_ESCAPES = str.maketrans({
+    '\\': '\\\\',
+    '\t': '\\t',
+    '\n': '\\n',
+    '\r': '\\r'
+})
 
 
 class SQLDB(ABC):
 
     @abstractmethod
-    def select_one(self, query):
+    def select_one(self, query, params=None):
         pass
 
     @abstractmethod
-    def select_all(self, query):
+    def select_all(self, query, params=None):
         pass
 
     @abstractmethod
-    def execute(self, query):
+    def execute(self, query, params=None):
         pass
 
 
+
+class Statement(NamedTuple):
+    """Prepared statement: name and the parameters of EXECUTE, names of
+    the mapping in the order of $n or None for a sequence."""
+    name: str
+    count: int
+    keys: Optional[tuple]
+
+
+class PreparedStatements:
+    """
+    LRU cache of prepared statements of one connection.
+    A query is prepared (PREPARE ... AS with $n placeholders) when it runs
+    'threshold' times and then runs as EXECUTE, so Postgres does not parse
+    and plan it again. A query which can not be prepared (e.g. the type of
+    a parameter is unknown, 'IN %s' with a tuple, several statements) runs
+    as a plain one. Statements evicted from the cache are deallocated.
+    """
+    _caches = weakref.WeakKeyDictionary()
+    _caches_lock = threading.Lock()
+    _preparable = re.compile(
+        r'\s*\(?\s*(select|insert|update|delete|values|with)\b',
+        re.IGNORECASE)
+    _placeholder = re.compile(r'%(?:\(([^)]*)\))?(.)', re.DOTALL)
+
+    def __init__(self, size: int, threshold: int):
+        self.size = size
+        self.threshold = threshold
+        # (query, style of params) -> count of runs, Statement or False
+        self.queries = OrderedDict()
+        self.counter = itertools.count(1)
+        self.lock = threading.Lock()
+
+    @classmethod
+    def for_connection(cls, connection, size: int, threshold: int):
+        with cls._caches_lock:
+            result = cls._caches.get(connection)
+            if result is None:
+                result = cls._caches[connection] = cls(size, threshold)
+            return result
+
+    def execute(self, cursor, query, params=None):
+        # '%%' means '%' only if there are params, mappings are bound by name
+        key = (query, None if params is None else isinstance(params, dict))
+        with self.lock:
+            state = self.queries.pop(key, 0)
+            # The most recently used query goes to the end
+            self.queries[key] = state
+            if type(state) is int:
+                self.queries[key] = state = state + 1
+                if state >= self.threshold:
+                    state = self._prepare(cursor, key, params)
+            self._evict(cursor)
+            if isinstance(state, Statement):
+                cursor.execute(self._execute_query(state),
+                               self._values(state, params))
+                return
+        cursor.execute(query, params)
+
+    def _prepare(self, cursor, key, params):
+        """Returns Statement or False."""
+        converted = self._convert(key[0], params)
+        statement = False
+        if converted is not None:
+            query, count, keys = converted
+            name = f'qa_statement_{next(self.counter)}'
+            if self._run(cursor, f'PREPARE {name} AS {query}'):
+                statement = Statement(name, count, keys)
+        self.queries[key] = statement
+        return statement
+
+    def _evict(self, cursor):
+        """Removes the least recently used queries."""
+        while len(self.queries) > self.size:
+            _, state = self.queries.popitem(last=False)
+            if isinstance(state, Statement):
+                self._run(cursor, f'DEALLOCATE {state.name}')
+
+    @staticmethod
+    def _run(cursor, statement) -> bool:
+        savepoint = not cursor.connection.autocommit
+        if savepoint:
+            # An error must not abort the transaction of the caller
+            cursor.execute('SAVEPOINT qa_prepare')
+        try:
+            cursor.execute(statement)
+            return True
+        except psycopg2.Error:
+            if savepoint:
+                cursor.execute('ROLLBACK TO SAVEPOINT qa_prepare')
+            return False
+        finally:
+            if savepoint:
+                cursor.execute('RELEASE SAVEPOINT qa_prepare')
+
+    @classmethod
+    def _convert(cls, query, params):
+        """
+        (query with $n instead of psycopg2 placeholders, count of
+        parameters, names of the mapping in the order of $n) or None.
+        $n are numbered in the order of appearance, so keys of a mapping
+        which are not used by the query are not bound.
+        """
+        query = query.rstrip().rstrip(';')
+        if ';' in query or not cls._preparable.match(query):
+            # PREPARE takes one statement, the rest would run at once
+            return None
+        if params is None:
+            return query, 0, None
+        mapping = isinstance(params, dict)
+        keys = []
+        positions = itertools.count(1)
+        errors = []
+
+        def replace(match):
+            name, kind = match.groups()
+            if kind == '%' and name is None:
+                return '%'
+            if kind != 's' or (name is None) == mapping \
+                    or (mapping and name not in params):
+                errors.append(match.group())
+                return match.group()
+            if not mapping:
+                return f'${next(positions)}'
+            if name not in keys:
+                keys.append(name)
+            return f'${keys.index(name) + 1}'
+
+        result = cls._placeholder.sub(replace, query)
+        if errors:
+            return None
+        if mapping:
+            return result, len(keys), tuple(keys)
+        count = next(positions) - 1
+        if count != len(params):
+            return None
+        return result, count, None
+
+    @staticmethod
+    def _execute_query(statement: Statement) -> str:
+        if not statement.count:
+            return f'EXECUTE {statement.name}'
+        return (f'EXECUTE {statement.name} '
+                f'({", ".join(["%s"] * statement.count)})')
+
+    @staticmethod
+    def _values(statement: Statement, params):
+        if not statement.count:
+            return None
+        if statement.keys is None:
+            return list(params)
+        return [params[x] for x in statement.keys]
+
+
 class Postgres(SQLDB):
+    # Size of LRU cache of prepared statements of a connection, 0 - off.
+    # Opt-in: not for transaction poolers (pgbouncer) and DDL which changes
+    # result types of cached queries. prepare_threshold - count of runs of
+    # a query after which it is prepared
+    statement_cache_size: int = 0
+    prepare_threshold: int = 2
 
     def __init__(self, connection):
         self._connection = connection
+        # Connection -> count of nested isolated() blocks
+        self._isolation = weakref.WeakKeyDictionary()
 
     def __str__(self):
         if self._connection:
@@ -40,55 +241,621 @@ class Postgres(SQLDB):
             string = 'No connection'
         return '\n--------------\n{}\n--------------'.format(string)
 
-    def select_one(self, query):
-        cursor = self._common_cursor_steps(query)
-        result = cursor.fetchone()
-        if Logger.log_sql:
-            Logger.append_sql(query, result)
+    @contextmanager
+    def _connect(self):
+        """Connection for one operation, see PooledPostgres."""
+        yield self._connection
+
+    @contextmanager
+    def _connect_dedicated(self):
+        """Connection which is not used by other operations meanwhile."""
+        yield self._connection
+
+    def _connect_isolated(self):
+        """Connection of an isolated() block."""
+        return self._connect()
+
+    @contextmanager
+    def isolated(self):
+        """
+        Changes made inside the block are rolled back at its exit, it is
+        much faster than DELETE cleanup and the data of a test does not
+        leak to other tests. Operations commit to a savepoint instead of
+        the database, so an error still rolls back only the failed
+        operation; nested blocks roll back to their own savepoints.
+        Note: uncommitted changes are visible only to this connection,
+        not to the services under test, see the db_commit marker. With
+        PooledPostgres the block isolates the connection of the current
+        thread, asyncio tasks started inside the block (e.g. by
+        asyncio.run()) share it while the block is open. Other threads,
+        including ones started via Logger.wrap(), use their own
+        connections: their changes are committed and they do not see the
+        changes of the block.
+        Usage: 'with db.isolated(): db.execute(INSERT_QUERY)'
+        """
+        with self._connect_isolated() as connection:
+            depth = self._isolation.get(connection, 0)
+            autocommit = connection.autocommit
+            if depth == 0:
+                # Pending changes of the previous operations are kept
+                connection.commit()
+                connection.autocommit = False
+            with connection.cursor() as cursor:
+                cursor.execute(f'SAVEPOINT qa_isolation_{depth}; '
+                               f'SAVEPOINT qa_operation')
+            self._isolation[connection] = depth + 1
+            try:
+                yield self
+            finally:
+                if depth == 0:
+                    del self._isolation[connection]
+                    connection.rollback()
+                    connection.autocommit = autocommit
+                else:
+                    self._isolation[connection] = depth
+                    with connection.cursor() as cursor:
+                        cursor.execute(
+                            f'ROLLBACK TO SAVEPOINT qa_isolation_{depth}; '
+                            f'RELEASE SAVEPOINT qa_isolation_{depth}')
+
+    def _commit(self, connection):
+        if connection not in self._isolation:
+            connection.commit()
+            return
+        with connection.cursor() as cursor:
+            cursor.execute('RELEASE SAVEPOINT qa_operation; '
+                           'SAVEPOINT qa_operation')
+
+    def _rollback(self, connection):
+        if connection not in self._isolation:
+            connection.rollback()
+            return
+        with connection.cursor() as cursor:
+            cursor.execute('ROLLBACK TO SAVEPOINT qa_operation')
+
+    def select_one(self, query, params=None):
+        """
+        'params' - sequence for %s placeholders or mapping for %(name)s
+        ones, values are bound by psycopg2 (for all the methods).
+        """
+        started = time.perf_counter()
+        with self._connect() as connection:
+            cursor = self._common_cursor_steps(connection, query, params)
+            result = cursor.fetchone()
+        if Logger.log_sql or TrafficLog.enabled:
+            Logger.append_sql(query, result,
+                              comment=self._params_comment(params),
+                              elapsed=time.perf_counter() - started)
         return RecursiveConverter(result)
 
-    def select_all(self, query):
-        cursor = self._common_cursor_steps(query)
-        result = cursor.fetchall()
-        if Logger.log_sql:
-            Logger.append_sql(query, result)
+    def select_iter(self, query, params=None, batch_size: int = 1000,
+                    sample_size: int = 10):
+        """
+        Rows of a big result one by one, as read-only ExtDictView objects.
+        Rows are fetched from a named (server-side) cursor in batches of
+        'batch_size', so memory does not depend on the size of the result.
+        Only the first 'sample_size' rows and the count of rows are logged.
+        Usage: 'for row in db.select_iter(query): assert row.amount > 0'
+        Note: with a plain Postgres do not run other queries of the same
+        instance inside the loop (their commit closes the cursor),
+        PooledPostgres uses a separate connection for the cursor (except
+        in isolated() blocks). A transaction left open on the connection
+        is kept: the cursor runs inside a savepoint of it.
+        """
+        started = time.perf_counter()
+        sample = []
+        count = 0
+        with self._connect_dedicated() as connection:
+            autocommit = connection.autocommit
+            # Work of the caller or of the isolated() block
+            pending = not autocommit and connection.status != STATUS_READY
+            if autocommit:
+                # Named cursors exist only inside a transaction
+                connection.autocommit = False
+            elif pending:
+                with connection.cursor() as cursor:
+                    cursor.execute('SAVEPOINT qa_select_iter')
+            cursor = connection.cursor(name=f'select_iter_{uuid4().hex}',
+                                       cursor_factory=RealDictCursor)
+            cursor.itersize = batch_size
+            try:
+                cursor.execute(query, params)
+                while rows := cursor.fetchmany(batch_size):
+                    for row in rows:
+                        if count < sample_size:
+                            sample.append(row)
+                        count += 1
+                        yield ExtDictView(row)
+            finally:
+                self._finish_iter(connection, cursor, autocommit, pending)
+                if Logger.log_sql or TrafficLog.enabled:
+                    comment = f'{count} rows, the first {len(sample)} ' \
+                              f'are shown'
+                    if params is not None:
+                        comment += f'; {self._params_comment(params)}'
+                    Logger.append_sql(query, sample,
+                                      comment=comment,
+                                      elapsed=time.perf_counter() - started,
+                                      rows=count)
+
+    @staticmethod
+    def _finish_iter(connection, cursor, autocommit, pending):
+        """Ends the read of select_iter(), only its own changes of the
+        transaction state are undone."""
+        if connection.closed:
+            return
+        try:
+            cursor.close()
+        except psycopg2.Error:
+            # The query failed, the transaction is recovered below
+            pass
+        if pending:
+            with connection.cursor() as savepoint:
+                savepoint.execute('ROLLBACK TO SAVEPOINT qa_select_iter; '
+                                  'RELEASE SAVEPOINT qa_select_iter')
+        else:
+            connection.rollback()
+        if autocommit:
+            connection.autocommit = True
+
+    def select_all(self, query, params=None):
+        started = time.perf_counter()
+        with self._connect() as connection:
+            cursor = self._common_cursor_steps(connection, query, params)
+            result = cursor.fetchall()
+        if Logger.log_sql or TrafficLog.enabled:
+            Logger.append_sql(query, result,
+                              comment=self._params_comment(params),
+                              elapsed=time.perf_counter() - started)
         return RecursiveConverter(result)
 
-    def _common_cursor_steps(self, query):
-        result = self._connection.cursor(cursor_factory=RealDictCursor)
-        result.execute(query)
-        self._connection.commit()
+    def _common_cursor_steps(self, connection, query, params=None):
+        result = connection.cursor(cursor_factory=RealDictCursor)
+        self._execute(connection, result, query, params)
+        self._commit(connection)
         return result
 
-    def execute(self, query):
-        cursor = self._connection.cursor()
-        try:
-            cursor.execute(query)
-            if cursor.rowcount > 0:
-                self._connection.commit()
-            else:
-                Logger.append_text(f'Count of changed rows: {cursor.rowcount}\n'
-                                   f'Request: "{query}"')
-        except Exception as e:
-            Logger.append_text(f'Postgres database error:\n{e}')
-            self._connection.rollback()
+    def _execute(self, connection, cursor, query, params=None):
+        """Runs repeated queries as prepared statements, see
+        PreparedStatements."""
+        if self.statement_cache_size:
+            PreparedStatements.for_connection(
+                connection, self.statement_cache_size, self.prepare_threshold
+            ).execute(cursor, query, params)
+        else:
+            cursor.execute(query, params)
+
+    @staticmethod
+    def _params_comment(params):
+        return None if params is None else f'params: {params!r}'
+
+    def execute(self, query, params=None):
+        with self._connect() as connection:
+            cursor = connection.cursor()
+            try:
+                self._execute(connection, cursor, query, params)
+                # DDL, TRUNCATE, NOTIFY etc. report no rows but have to be
+                # committed too: a pooled connection is rolled back on release
+                self._commit(connection)
+                if cursor.rowcount <= 0:
+                    Logger.append_text(
+                        f'Count of changed rows: {cursor.rowcount}\n'
+                        f'Request: "{query}"')
+            except Exception as e:
+                Logger.append_text(f'Postgres database error:\n{e}')
+                self._rollback(connection)
         return cursor.rowcount
 
+    def copy_rows(self, table: str, rows, columns=None,
+                  batch_size: int = 10000) -> int:
+        """
+        Bulk load with COPY FROM STDIN in one transaction.
+        'rows' - iterable of dicts (columns are taken from the first one)
+        or of sequences in the order of 'columns'. Rows are sent in chunks
+        of 'batch_size' rows built in memory as COPY text format.
+        Returns count of loaded rows.
+        """
+        columns, rows = self._bulk_rows(rows, columns)
+        statement = sql.SQL('COPY {} ({}) FROM STDIN').format(
+            self._identifier(table),
+            sql.SQL(', ').join(map(sql.Identifier, columns)))
+
+        def load(cursor):
+            count = 0
+            for batch in self._batches(rows, batch_size):
+                stream = io.StringIO()
+                for row in batch:
+                    stream.write('\t'.join(map(self._copy_value, row)))
+                    stream.write('\n')
+                stream.seek(0)
+                cursor.copy_expert(statement, stream)
+                count += len(batch)
+            return count
+
+        return self._bulk(f'COPY {table} ({", ".join(columns)}) FROM STDIN',
+                          load)
+
+    def insert_rows(self, table: str, rows, columns=None,
+                    page_size: int = 1000) -> int:
+        """
+        Bulk insert with multi-row INSERT ... VALUES statements of
+        'page_size' rows with bound parameters, in one transaction.
+        'rows' - as for copy_rows(). Returns count of inserted rows.
+        """
+        columns, rows = self._bulk_rows(rows, columns)
+        statement = sql.SQL('INSERT INTO {} ({}) VALUES %s').format(
+            self._identifier(table),
+            sql.SQL(', ').join(map(sql.Identifier, columns)))
+
+        def load(cursor):
+            count = 0
+            for batch in self._batches(rows, page_size):
+                execute_values(cursor, statement, batch, page_size=page_size)
+                count += len(batch)
+            return count
+
+        return self._bulk(f'INSERT INTO {table} ({", ".join(columns)}) '
+                          f'VALUES ...', load)
+
+    def _bulk(self, query: str, load) -> int:
+        started = time.perf_counter()
+        with self._connect() as connection:
+            autocommit = connection.autocommit
+            if autocommit:
+                # All batches are loaded in one transaction
+                connection.autocommit = False
+            try:
+                with connection.cursor() as cursor:
+                    count = load(cursor)
+                self._commit(connection)
+            except Exception as e:
+                Logger.append_text(f'Postgres database error:\n{e}')
+                self._rollback(connection)
+                raise
+            finally:
+                if autocommit:
+                    connection.autocommit = True
+        elapsed = time.perf_counter() - started
+        if Logger.log_sql or TrafficLog.enabled:
+            rate = count / elapsed if elapsed else count
+            Logger.append_sql(query, None,
+                              comment=f'{count} rows in {elapsed:.2f} s, '
+                                      f'{rate:.0f} rows/s',
+                              elapsed=elapsed,
+                              rows=count)
+        return count
+
+    @staticmethod
+    def _bulk_rows(rows, columns):
+        rows = iter(rows)
+        first = next(rows, None)
+        if first is None:
+            return list(columns or []), iter(())
+        if hasattr(first, 'keys'):
+            columns = list(columns or first.keys())
+            rows = (tuple(x[c] for c in columns)
+                    for x in itertools.chain([first], rows))
+        elif columns is None:
+            raise ValueError('columns are required for rows of sequences')
+        else:
+            rows = itertools.chain([first], rows)
+        return list(columns), rows
+
+    @staticmethod
+    def _batches(rows, size):
+        while batch := list(itertools.islice(rows, size)):
+            yield batch
+
+    @staticmethod
+    def _identifier(name: str):
+        return sql.Identifier(*name.split('.'))
+
+    @staticmethod
+    def _copy_value(value) -> str:
+        if value is None:
+            return '\\N'
+        if isinstance(value, bool):
+            return 't' if value else 'f'
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            # bytea hex format
+            value = '\\x' + bytes(value).hex()
+        elif isinstance(value, (dict, list)):
+            value = json.dumps(value, ensure_ascii=False, default=str)
+        elif hasattr(value, 'isoformat'):
+            # date, datetime, time
+            value = value.isoformat()
+        else:
+            value = str(value)
+        return value.translate(_COPY_ESCAPES)
+
     def execute_few_transactions(self, queries):
         """
         queries - is a python list with all queries you need to execute
         Example: DELETE_TABLES = ["DELETE FROM TEST", "DELETE FROM TEST1"]
+        A query with parameters is a tuple: ("DELETE FROM TEST WHERE id = %s",
+        (1,))
         """
-        cursor = self._connection.cursor()
-        try:
-            for query in queries:
-                cursor.execute(query)
-                self._connection.commit()
-        except psycopg2.DatabaseError as e:
-            Logger.append_text(f'Postgres database error:\n{e}')
-            self._connection.rollback()
+        with self._connect() as connection:
+            cursor = connection.cursor()
+            try:
+                for query in queries:
+                    if isinstance(query, str):
+                        query = (query, None)
+                    self._execute(connection, cursor, *query)
+                    self._commit(connection)
+            except psycopg2.DatabaseError as e:
+                Logger.append_text(f'Postgres database error:\n{e}')
+                self._rollback(connection)
         return cursor.rowcount
 
+    @contextmanager
+    def listen(self, channel: str):
+        """
+        Subscription to notifications of 'channel' (NOTIFY, pg_notify() of
+        a trigger) for the block, yields wait(timeout) which returns True
+        when a notification came and False after 'timeout' seconds.
+        Note: LISTEN takes effect only when its transaction commits, so in
+        isolated() blocks notifications are disabled: wait() just sleeps.
+        """
+        with self._connect_dedicated() as connection:
+            if connection in self._isolation:
+                Logger.append_text(f'Notifications of "{channel}" are '
+                                   f'disabled in isolated() block')
+                yield self._sleep
+                return
+            with connection.cursor() as cursor:
+                cursor.execute(sql.SQL('LISTEN {}').format(
+                    sql.Identifier(channel)))
+            self._commit(connection)
+            try:
+                yield partial(self._wait_notification, connection, channel)
+            finally:
+                with connection.cursor() as cursor:
+                    cursor.execute(sql.SQL('UNLISTEN {}').format(
+                        sql.Identifier(channel)))
+                self._commit(connection)
+
+    @staticmethod
+    def _sleep(timeout: float) -> bool:
+        time.sleep(timeout)
+        return False
+
+    @staticmethod
+    def _wait_notification(connection, channel: str, timeout: float) -> bool:
+        deadline = time.monotonic() + timeout
+        while True:
+            connection.poll()
+            notifies = connection.notifies
+            if any(x.channel == channel for x in notifies):
+                notifies[:] = [x for x in notifies if x.channel != channel]
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            select.select([connection], [], [], remaining)
+
+
+class PoolTimeoutError(Exception):
+    pass
+
+
+class _Binding:
+    """Connection bound to its owner (thread, asyncio task) by
+    ConnectionPool.connection(). 'shared' - tasks of the owner thread
+    use it too. 'connection' is None after the block exits, so tasks which
+    outlive the block do not use a released connection."""
+    __slots__ = ('owner', 'connection', 'shared')
+
+    def __init__(self, owner, connection, shared=False):
+        self.owner = owner
+        self.connection = connection
+        self.shared = shared
+
+    def serves(self, owner) -> bool:
+        return self.connection is not None and (
+            self.owner == owner
+            or self.shared and self.owner[0] == owner[0])
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of DB-API connections created by 'connect'.
+    - min_size connections are opened at once, at most max_size are open;
+    - acquire() waits for a free connection at most 'timeout' seconds and
+      raises PoolTimeoutError;
+    - a connection which was idle longer than 'check_interval' seconds is
+      checked with 'check_query' before it is handed out, broken
+      connections are replaced;
+    - connection() binds the connection to the current thread or asyncio
+      task until the outermost 'with' block exits, so nested operations
+      use the same connection and concurrent ones never share it;
+      connection(shared=True) lets asyncio tasks started in the block
+      (they run in the same thread) use the connection as well.
+    Returned connections are rolled back if a transaction is left open.
+    """
+
+    def __init__(self, connect, min_size: int = 1, max_size: int = 10,
+                 timeout: float = 30.0, check_interval: float = 30.0,
+                 check_query: str = 'SELECT 1'):
+        if not 0 <= min_size <= max_size or max_size < 1:
+            raise ValueError(f'Invalid pool size: {min_size}..{max_size}')
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.check_interval = check_interval
+        self.check_query = check_query
+        # (connection, time of release)
+        self._idle = deque()
+        self._size = 0
+        self._closed = False
+        self._condition = threading.Condition()
+        self._bound = ContextVar(f'pool_{id(self)}', default=None)
+        for _ in range(min_size):
+            self._idle.append((self._open(), time.monotonic()))
+
+    def __str__(self):
+        return f'ConnectionPool(size={self._size}, idle={len(self._idle)}, ' \
+               f'max_size={self.max_size})'
+
+    def acquire(self, timeout: float = None):
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._condition:
+                while not self._idle and self._size >= self.max_size:
+                    if self._closed:
+                        raise PoolTimeoutError('Pool is closed')
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolTimeoutError(
+                            f'No free connection in {timeout} s: {self}')
+                    self._condition.wait(remaining)
+                if self._closed:
+                    raise PoolTimeoutError('Pool is closed')
+                if self._idle:
+                    connection, released = self._idle.pop()
+                else:
+                    connection, released = None, None
+                    # Reserve the place before connecting
+                    self._size += 1
+            if connection is None:
+                try:
+                    return self._open(reserved=True)
+                except Exception:
+                    self._discard(None)
+                    raise
+            if self._is_healthy(connection, released):
+                return connection
+            self._discard(connection)
+
+    def release(self, connection):
+        healthy = not connection.closed
+        if healthy and connection.status != STATUS_READY:
+            try:
+                connection.rollback()
+            except psycopg2.Error:
+                healthy = False
+        if not healthy or self._closed:
+            self._discard(connection)
+            return
+        with self._condition:
+            self._idle.append((connection, time.monotonic()))
+            self._condition.notify()
+
+    @contextmanager
+    def connection(self, timeout: float = None, shared: bool = False):
+        owner = self._owner()
+        bound = self._bound.get()
+        if bound is not None and bound.serves(owner):
+            if not shared or bound.shared:
+                yield bound.connection
+                return
+            bound.shared = True
+            try:
+                yield bound.connection
+            finally:
+                bound.shared = False
+            return
+        connection = self.acquire(timeout)
+        binding = _Binding(owner, connection, shared)
+        token = self._bound.set(binding)
+        try:
+            yield connection
+        finally:
+            binding.connection = None
+            self._bound.reset(token)
+            self.release(connection)
+
+    def bound(self):
+        """Connection bound to the current thread or task by connection()
+        or None."""
+        bound = self._bound.get()
+        if bound is not None and bound.serves(self._owner()):
+            return bound.connection
+        return None
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._condition.notify_all()
+        for connection, _ in idle:
+            self._discard(connection)
+
+    def _open(self, reserved=False):
+        connection = self._connect()
+        if not reserved:
+            with self._condition:
+                self._size += 1
+        return connection
+
+    def _discard(self, connection):
+        if connection is not None and not connection.closed:
+            try:
+                connection.close()
+            except psycopg2.Error:
+                pass
+        with self._condition:
+            self._size -= 1
+            self._condition.notify()
+
+    def _is_healthy(self, connection, released) -> bool:
+        if connection.closed:
+            return False
+        if time.monotonic() - released < self.check_interval:
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(self.check_query)
+            connection.rollback()
+        except psycopg2.Error:
+            return False
+        return True
+
+    @staticmethod
+    def _owner():
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            task = None
+        return threading.get_ident(), id(task) if task else None
+
+
+class PooledPostgres(Postgres):
+    """
+    Postgres on a ConnectionPool: every operation takes a connection of the
+    current thread or task, so the instance can be shared by concurrent
+    tests and background pollers.
+    """
+
+    def __init__(self, pool: ConnectionPool):
+        super().__init__(None)
+        self.pool = pool
+
+    def __str__(self):
+        return f'\n--------------\n{self.pool}\n--------------'
+
+    def _connect(self):
+        return self.pool.connection()
+
+    def _connect_isolated(self):
+        return self.pool.connection(shared=True)
+
+    @contextmanager
+    def _connect_dedicated(self):
+        bound = self.pool.bound()
+        if bound is not None and bound in self._isolation:
+            # The cursor has to see the changes of the isolated() block
+            yield bound
+            return
+        connection = self.pool.acquire()
+        try:
+            yield connection
+        finally:
+            self.pool.release(connection)
+
 
 class ConnectionManager(ABC):
 
@@ -96,6 +863,7 @@ class ConnectionManager(ABC):
         self.config = config
         self.pytest_request = pytest_request
         self.tunnel = None
+        self.pool = None
 
     def get_connection(self):
         if self.config.get('ssh_host'):
@@ -107,6 +875,24 @@ class ConnectionManager(ABC):
             self.pytest_request.addfinalizer(self.close_connection)
         return connection
 
+    def get_pool(self, min_size=1, max_size=10, timeout=30.0,
+                 **kwargs) -> ConnectionPool:
+        """
+        Pool of connections through one SSH tunnel (if configured),
+        closed together with the tunnel by the pytest finalizer.
+        """
+        if self.config.get('ssh_host'):
+            self.open_tunnel()
+            connect = self.connect_with_tunnel
+        else:
+            connect = self.connect_direct
+        self.pool = ConnectionPool(connect, min_size=min_size,
+                                   max_size=max_size, timeout=timeout,
+                                   **kwargs)
+        if self.pytest_request:
+            self.pytest_request.addfinalizer(self.close_connection)
+        return self.pool
+
     @abstractmethod
     def connect_with_tunnel(self):
         pass
@@ -116,6 +902,8 @@ class ConnectionManager(ABC):
         pass
 
     def close_connection(self):
+        if self.pool:
+            self.pool.close()
         if self.tunnel:
             self.tunnel.stop()
 
@@ -0,0 +1,282 @@
+"""
+Diff engine for JSON-shaped data: dict, ExtDict, TupleDict, lists and
+scalars. Produces the same report format as DictDiff (DeepDiff), so it can
+be used as a drop-in replacement in response checks, but walks the trees
+iteratively in a single pass and supports path-level rules:
+- ignore: glob paths excluded from the comparison, e.g. 'items[*].updated_at',
+    '**.id', 'meta.*'. Segments are separated by dots, list indexes are
+    written as [N] or [*], '*' and '?' in a key work as in fnmatch,
+    '**' matches any number of segments;
+- ignore_order: mapping of glob path of a list to the name of the field
+    which identifies its items, e.g. {'items': 'id'}. Items of such lists
+    are matched by that field instead of by position;
+- tolerance: absolute tolerance for numeric values (int and float values
+    are comparable when the tolerance is set).
+"""
+import json
+import re
+from collections import deque
+from fnmatch import fnmatchcase
+
+from utils.altcollections import (
+    DICTS,
+    SCALARS
+)
+
+
+ARRAYS = (list, tuple)
+NUMBERS = (int, float)
+
+VALUES_CHANGED = 'values_changed'
+TYPE_CHANGES = 'type_changes'
+DICT_ITEM_ADDED = 'dictionary_item_added'
+DICT_ITEM_REMOVED = 'dictionary_item_removed'
+ITERABLE_ITEM_ADDED = 'iterable_item_added'
+ITERABLE_ITEM_REMOVED = 'iterable_item_removed'
+
+_TOKEN = re.compile(r'\[(\*|\d+)\]|([^.\[\]]+)')
+_ANY_DEPTH = '**'
+_MISSING = object()
+
+
+class PathPatterns:
+    """
+    Set of compiled glob paths. Matching is incremental: the state of the
+    parent node is advanced by one path segment, so the cost of a node
+    does not depend on its depth.
+    """
+
+    def __init__(self, patterns=()):
+        self.patterns = [self.compile(x) for x in patterns]
+        # Steps into list items can be cached only if no pattern refers
+        # to a concrete index
+        self._cache_indexes = not any(
+            kind == 'index' and value is not None
+            for tokens in self.patterns for kind, value in tokens
+        )
+        # Transitions of step() and results of matched(), both are keyed
+        # by frozensets of states, so they must not share a dict
+        self._steps = {}
+        self._matched = {}
+        initial = self._closure({(i, 0) for i in range(len(self.patterns))})
+        self.initial = frozenset(initial)
+
+    @staticmethod
+    def compile(pattern: str) -> tuple:
+        tokens = []
+        for segment in pattern.split('.'):
+            if segment == _ANY_DEPTH:
+                tokens.append((_ANY_DEPTH, None))
+                continue
+            position = 0
+            for match in _TOKEN.finditer(segment):
+                if match.start() != position:
+                    break
+                index, key = match.groups()
+                if key is not None:
+                    tokens.append(('key', key))
+                else:
+                    index = None if index == '*' else int(index)
+                    tokens.append(('index', index))
+                position = match.end()
+            if position != len(segment) or not segment:
+                raise ValueError(f'Invalid path pattern: {pattern!r}')
+        return tuple(tokens)
+
+    def _closure(self, states) -> set:
+        result = set(states)
+        for pattern_id, position in states:
+            tokens = self.patterns[pattern_id]
+            while position < len(tokens) and tokens[position][0] == _ANY_DEPTH:
+                position += 1
+                result.add((pattern_id, position))
+        return result
+
+    def step(self, states: frozenset, key, is_index: bool) -> frozenset:
+        if not states:
+            return states
+        cacheable = not is_index or self._cache_indexes
+        cache_key = (states, is_index, None if is_index else key)
+        if cacheable and cache_key in self._steps:
+            return self._steps[cache_key]
+        result = set()
+        for pattern_id, position in states:
+            tokens = self.patterns[pattern_id]
+            if position == len(tokens):
+                continue
+            kind, value = tokens[position]
+            if kind == _ANY_DEPTH:
+                result.add((pattern_id, position))
+            elif kind == 'index':
+                if is_index and (value is None or value == key):
+                    result.add((pattern_id, position + 1))
+            elif not is_index and fnmatchcase(str(key), value):
+                result.add((pattern_id, position + 1))
+        result = frozenset(self._closure(result))
+        if cacheable:
+            self._steps[cache_key] = result
+        return result
+
+    def matched(self, states: frozenset) -> tuple:
+        result = self._matched.get(states)
+        if result is None:
+            result = tuple(pattern_id for pattern_id, position in states
+                           if position == len(self.patterns[pattern_id]))
+            self._matched[states] = result
+        return result
+
+
+class JsonDiff(dict):
+    """
+    Compares 'expected' (old values) with 'actual' (new values).
+    The instance itself is the report: empty dict means no differences.
+    """
+
+    def __init__(self, expected, actual, ignore=None, ignore_order=None,
+                 tolerance=0):
+        super().__init__()
+        ignore = list(ignore or [])
+        ignore_order = dict(ignore_order or {})
+        self._ignore_count = len(ignore)
+        self._order_keys = list(ignore_order.values())
+        self._patterns = PathPatterns(ignore + list(ignore_order))
+        self.tolerance = tolerance
+        self._compare(expected, actual)
+
+    def to_dict(self) -> dict:
+        return dict(self)
+
+    def to_json(self, **kwargs) -> str:
+        return json.dumps(self, default=self._json_default,
+                          ensure_ascii=False, **kwargs)
+
+    @staticmethod
+    def _json_default(value):
+        if isinstance(value, type):
+            return value.__name__
+        return str(value)
+
+    @staticmethod
+    def render_path(node) -> str:
+        parts = []
+        while node is not None:
+            node, key, is_index = node
+            parts.append(f'[{key}]' if is_index else f'[{key!r}]')
+        return 'root' + ''.join(reversed(parts))
+
+    def _report(self, report_type, node, value=None):
+        path = self.render_path(node)
+        if report_type in (DICT_ITEM_ADDED, DICT_ITEM_REMOVED):
+            self.setdefault(report_type, []).append(path)
+        else:
+            self.setdefault(report_type, {})[path] = value
+
+    def _order_key(self, states):
+        for pattern_id in self._patterns.matched(states):
+            if pattern_id >= self._ignore_count:
+                return self._order_keys[pattern_id - self._ignore_count]
+        return _MISSING
+
+    def _ignored(self, states) -> bool:
+        return any(x < self._ignore_count
+                   for x in self._patterns.matched(states))
+
+    def _compare(self, expected, actual):
+        patterns = self._patterns
+        stack = [(expected, actual, None, patterns.initial)]
+        while stack:
+            old, new, node, states = stack.pop()
+            if old is new or (states and self._ignored(states)):
+                continue
+            old_type, new_type = type(old), type(new)
+
+            if old_type in DICTS and new_type in DICTS:
+                for key, value in old.items():
+                    child = (node, key, False)
+                    child_states = patterns.step(states, key, False)
+                    if key in new:
+                        stack.append((value, dict.__getitem__(new, key),
+                                      child, child_states))
+                    elif not self._ignored(child_states):
+                        self._report(DICT_ITEM_REMOVED, child)
+                for key in new:
+                    if key not in old:
+                        child_states = patterns.step(states, key, False)
+                        if not self._ignored(child_states):
+                            self._report(DICT_ITEM_ADDED, (node, key, False))
+
+            elif old_type in ARRAYS and old_type is new_type:
+                order_key = self._order_key(states) if states else _MISSING
+                if order_key is _MISSING:
+                    self._compare_in_order(old, new, node, states, stack)
+                else:
+                    self._compare_by_key(old, new, node, states, stack,
+                                         order_key)
+
+            elif (old_type in NUMBERS and new_type in NUMBERS
+                  and self.tolerance):
+                if abs(old - new) > self.tolerance:
+                    self._report(VALUES_CHANGED, node,
+                                 {'new_value': new, 'old_value': old})
+
+            elif old_type is not new_type and (old_type in SCALARS
+                                               or old_type in DICTS
+                                               or old_type in ARRAYS):
+                self._report(TYPE_CHANGES, node, {
+                    'old_type': old_type,
+                    'new_type': new_type,
+                    'old_value': old,
+                    'new_value': new
+                })
+
+            elif old != new:
+                # The same scalar types, or custom objects in 'expected'
+                # with their own __eq__ (e.g. CompareABC).
+                self._report(VALUES_CHANGED, node,
+                             {'new_value': new, 'old_value': old})
+
+    def _compare_in_order(self, old, new, node, states, stack):
+        step = self._patterns.step
+        for index, (old_item, new_item) in enumerate(zip(old, new)):
+            stack.append((old_item, new_item, (node, index, True),
+                          step(states, index, True)))
+        for index in range(len(new), len(old)):
+            if not self._ignored(step(states, index, True)):
+                self._report(ITERABLE_ITEM_REMOVED, (node, index, True),
+                             old[index])
+        for index in range(len(old), len(new)):
+            if not self._ignored(step(states, index, True)):
+                self._report(ITERABLE_ITEM_ADDED, (node, index, True),
+                             new[index])
+
+    def _compare_by_key(self, old, new, node, states, stack, order_key):
+        def item_key(item):
+            if type(item) in DICTS:
+                value = item.get(order_key, _MISSING)
+                try:
+                    hash(value)
+                except TypeError:
+                    return _MISSING
+                return value
+            return _MISSING
+
+        candidates = {}
+        for index, item in enumerate(new):
+            candidates.setdefault(item_key(item), deque()).append(index)
+        matched = set()
+        step = self._patterns.step
+        for index, item in enumerate(old):
+            child = (node, index, True)
+            child_states = step(states, index, True)
+            indexes = candidates.get(item_key(item))
+            if indexes:
+                new_index = indexes.popleft()
+                matched.add(new_index)
+                stack.append((item, new[new_index], child, child_states))
+            elif not self._ignored(child_states):
+                self._report(ITERABLE_ITEM_REMOVED, child, item)
+        for index, item in enumerate(new):
+            if index not in matched:
+                if not self._ignored(step(states, index, True)):
+                    self._report(ITERABLE_ITEM_ADDED, (node, index, True),
+                                 item)
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+
+"""
+Merges JSONL traffic logs of pytest workers (--traffic-log DIR) into an
+indexed SQLite database and runs typical queries on it.
+Usage:
+    python utils/traffic_index.py merge reports/traffic
+    python utils/traffic_index.py slowest -n 20 [--kind sql]
+    python utils/traffic_index.py errors [--min-status 500]
+    python utils/traffic_index.py sql "SELECT test, count(*) FROM calls
+                                       GROUP BY test"
+"""
+import argparse
+import json
+import sqlite3
+from pathlib import Path
+
+
+DATABASE = 'traffic.sqlite'
+COLUMNS = ('ts', 'worker', 'test', 'kind', 'method', 'template', 'url',
+           'status', 'elapsed_ms', 'request_bytes', 'response_bytes', 'rows')
+INDEXES = ('elapsed_ms', 'status, template', 'template', 'test')
+BATCH_SIZE = 10000
+
+
+def connect(database):
+    connection = sqlite3.connect(database)
+    connection.execute(
+        f'CREATE TABLE IF NOT EXISTS calls ({", ".join(COLUMNS)})')
+    return connection
+
+
+def merge(directory, database):
+    files = sorted(Path(directory).glob('traffic-*.jsonl'))
+    connection = connect(database)
+    insert = f'INSERT INTO calls VALUES ({", ".join("?" * len(COLUMNS))})'
+    count = 0
+    with connection:
+        connection.execute('DELETE FROM calls')
+        for path in files:
+            batch = []
+            with open(path, encoding='utf-8') as file:
+                for line in file:
+                    if not line.strip():
+                        continue
+                    record = json.loads(line)
+                    batch.append(tuple(record.get(x) for x in COLUMNS))
+                    if len(batch) == BATCH_SIZE:
+                        connection.executemany(insert, batch)
+                        count += len(batch)
+                        batch = []
+            connection.executemany(insert, batch)
+            count += len(batch)
+        for columns in INDEXES:
+            name = 'calls_' + columns.replace(', ', '_')
+            connection.execute(
+                f'CREATE INDEX IF NOT EXISTS {name} ON calls ({columns})')
+    connection.close()
+    print(f'{count} records from {len(files)} files -> {database}')
+
+
+def query(database, sql, parameters=()):
+    connection = connect(database)
+    cursor = connection.execute(sql, parameters)
+    header = [x[0] for x in cursor.description]
+    rows = cursor.fetchall()
+    connection.close()
+    print_table(header, rows)
+
+
+def print_table(header, rows):
+    rows = [['' if x is None else str(x) for x in row] for row in rows]
+    widths = [max([len(x)] + [len(row[i]) for row in rows])
+              for i, x in enumerate(header)]
+    print('  '.join(x.ljust(widths[i]) for i, x in enumerate(header)))
+    for row in rows:
+        print('  '.join(x.ljust(widths[i]) for i, x in enumerate(row)))
+
+
+def slowest(database, limit, kind=None):
+    where = 'WHERE kind = ?' if kind else ''
+    query(database,
+          f'SELECT elapsed_ms, kind, method, template, status, test '
+          f'FROM calls {where} ORDER BY elapsed_ms DESC LIMIT ?',
+          ((kind,) if kind else ()) + (limit,))
+
+
+def errors(database, min_status):
+    query(database,
+          'SELECT method, template, status, count(*) AS count, '
+          'max(elapsed_ms) AS max_ms, min(test) AS example_test '
+          'FROM calls WHERE status >= ? '
+          'GROUP BY method, template, status ORDER BY count DESC',
+          (min_status,))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-d", "--database", type=str, default=DATABASE,
+                        help="SQLite database file.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    merge_parser = commands.add_parser(
+        "merge", help="Merge traffic-*.jsonl files of the directory.")
+    merge_parser.add_argument("directory", type=str)
+    slowest_parser = commands.add_parser("slowest",
+                                         help="Slowest calls.")
+    slowest_parser.add_argument("-n", "--limit", type=int, default=20)
+    slowest_parser.add_argument("--kind", choices=("http", "sql"))
+    errors_parser = commands.add_parser(
+        "errors", help="Error responses per endpoint.")
+    errors_parser.add_argument("--min-status", type=int, default=500)
+    sql_parser = commands.add_parser(
+        "sql", help="Arbitrary query to the 'calls' table.")
+    sql_parser.add_argument("query", type=str)
+    args = parser.parse_args()
+
+    if args.command == "merge":
+        merge(args.directory, args.database)
+    elif args.command == "slowest":
+        slowest(args.database, args.limit, args.kind)
+    elif args.command == "errors":
+        errors(args.database, args.min_status)
+    else:
+        query(args.database, args.query)
@@ -1,27 +1,99 @@
+import asyncio
 import time
-from functools import wraps
+from contextlib import nullcontext
+from functools import (
+    partial,
+    wraps
+)
 
 import pytest
 
 
+_DB_STATE_ERROR = 'Waiting for db state failed: {}'
+
+
 def for_db_state(db: object,
                  query: str,
                  check_if_success: object,
                  timeout: int = 60,
                  not_found_error: str = 'no entry found!',
-                 timeout_error: str = 'timeout exceeded!'):
-    error = 'Waiting for db state failed: {}'
-    for _ in range(timeout):
-        result = db.select_one(query)
-        print(result)
-        if not result:
-            pytest.fail(error.format(not_found_error))
-        elif not check_if_success(result):
-            time.sleep(1)
-            continue
-        else:
-            return result
-    pytest.fail(error.format(timeout_error))
+                 timeout_error: str = 'timeout exceeded!',
+                 params=None,
+                 channel: str = None,
+                 interval: float = 0.05,
+                 max_interval: float = 1.0):
+    """
+    Runs the query until check_if_success(result) is true and returns the
+    result, fails at once if the query returns no row.
+    Checks are repeated with growing delays (from 'interval' up to
+    'max_interval' seconds) until the deadline in 'timeout' seconds.
+    'channel' - NOTIFY channel of the database (e.g. pg_notify() of a
+    trigger on the table) which wakes the waiter before the delay ends.
+    """
+    deadline = time.monotonic() + timeout
+    select = _db_select(db, query, params)
+    with _db_subscription(db, channel) as wait:
+        while True:
+            result = select()
+            if _db_state_reached(result, check_if_success, not_found_error):
+                return result
+            delay = _db_state_delay(deadline, interval, timeout_error)
+            wait(delay)
+            interval = min(interval * 2, max_interval)
+
+
+async def for_db_state_async(db: object,
+                             query: str,
+                             check_if_success: object,
+                             timeout: int = 60,
+                             not_found_error: str = 'no entry found!',
+                             timeout_error: str = 'timeout exceeded!',
+                             params=None,
+                             channel: str = None,
+                             interval: float = 0.05,
+                             max_interval: float = 1.0):
+    """for_db_state() for async tests: queries and waiting for notifications
+    run in threads, the event loop is not blocked."""
+    deadline = time.monotonic() + timeout
+    select = _db_select(db, query, params)
+    with _db_subscription(db, channel) as wait:
+        while True:
+            result = await asyncio.to_thread(select)
+            if _db_state_reached(result, check_if_success, not_found_error):
+                return result
+            delay = _db_state_delay(deadline, interval, timeout_error)
+            if channel:
+                await asyncio.to_thread(wait, delay)
+            else:
+                await asyncio.sleep(delay)
+            interval = min(interval * 2, max_interval)
+
+
+def _db_select(db, query, params):
+    # params are passed only if given: select_one(query) of other db
+    # classes may not accept them
+    if params is None:
+        return partial(db.select_one, query)
+    return partial(db.select_one, query, params)
+
+
+def _db_subscription(db, channel):
+    if channel:
+        return db.listen(channel)
+    return nullcontext(time.sleep)
+
+
+def _db_state_reached(result, check_if_success, not_found_error) -> bool:
+    if not result:
+        pytest.fail(_DB_STATE_ERROR.format(not_found_error))
+    return bool(check_if_success(result))
+
+
+def _db_state_delay(deadline, interval, timeout_error) -> float:
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        pytest.fail(_DB_STATE_ERROR.format(timeout_error))
+    return min(interval, remaining)
 
 
 def success_waiter(timeout: int = 30,